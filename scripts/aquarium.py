@@ -1,57 +1,118 @@
 import os
-import re
-import cv2
+import time
 import pygame
 
 from watchdog.observers import Observer
 from scripts.capture import Capture
+from scripts.fishIndex import SPRITE_SIZE, FishIndex, encode_thumbnail
 from scripts.flock import Flock
+from scripts.frameWriter import FrameWriter
+from scripts.governor import Governor
+from scripts.scanPipeline import ScanPipeline
 from scripts.scanner import Scanner
 from scripts.imageFileEventHandler import ImageFileEventHandler
+from scripts.presenter import RendererPresenter, SurfacePresenter
+from scripts.profiler import Profiler
+from scripts.recorder import Recorder
+from scripts.uploadServer import UploadServer
+from scripts.videoCache import VideoCache
+from scripts.videoDecoder import VideoDecoder
 
-FPS = 25  # adjust to video FPS
+FPS = 25  # render frames per second
+SIMULATION_RATE = 25  # simulation steps per second, independent of FPS
+MAX_SIMULATION_STEPS = 5  # max simulation steps per frame to catch up after slow frames
+SCAN_WORKERS = None  # scanner processes (None = one less than the number of cpus)
+NEIGHBORS = "grid"  # neighbor search for flocking forces: "dense" or "grid"
+ROTATION_STEPS = 72  # cached headings per fish sprite (0 = rotate every frame)
+VIDEO_CACHE = False  # play the background video from pre-decoded raw frames in data/cache
+PRESENTER = "surface"  # scale to the screen with "surface" (software) or "renderer" (SDL's renderer)
+PROFILE_LOG = None  # append per-frame timings as json lines to this file while profiling (toggled with p)
+SEED = None  # seed of the simulation's random numbers (None = random)
+RECORD = None  # record the simulation's input to this file, to replay it with utils/replay.py
+FISH_INDEX = os.path.join("data", "cache", "fishes.db")  # index of imported fishes (see utils/fishes.py)
+GOVERNOR = True  # lower quality step by step while frames take longer than 1 / FPS, and raise it again with headroom
+GOVERNOR_LOG = None  # append quality changes to this file, they are printed as well
+UPLOAD_PORT = None  # serve a page to upload photos of drawings from phones on this port (None = off)
+
+
+def load_thumbnail(data):
+    # sprite pixels of the index, already scaled and turned
+    return pygame.image.frombuffer(data, SPRITE_SIZE, "RGBA").convert_alpha()
 
 
 class Aquarium:
-    def __init__(self) -> None:
+    def __init__(self, offline=False) -> None:
         # setup display
         pygame.init()
         self.display = pygame.Surface((1280, 720))
-        self.scale = 1
-        self.margin = [0, 0]
-        pygame.display.set_caption("Fish Tank")
-        info = pygame.display.Info()
-        self.screen = pygame.display.set_mode((info.current_w, info.current_h), pygame.RESIZABLE)
-        self.on_resize()
+        if offline:
+            # rendering to files with render_offline, images still need a display mode to convert to
+            pygame.display.set_mode((1, 1), pygame.HIDDEN)
+            self.presenter = None
+        else:
+            presenter = RendererPresenter if PRESENTER == "renderer" else SurfacePresenter
+            self.presenter = presenter(self.display.get_size())
 
         # hide mouse
         pygame.mouse.set_visible(False)
 
         # ticks / fps
         self.clock = pygame.Clock()
+        self.timestep = 1 / SIMULATION_RATE
+        self.accumulator = 0.0
+        self.profiler = Profiler(log=PROFILE_LOG)
 
         # background video & audio
-        self.video = cv2.VideoCapture(os.path.join("data/video/underwater.mp4"))
-        self.audio = pygame.mixer.Sound(os.path.join("data/audio/aquarium-ambience.mp3"))
+        video = VideoCache if VIDEO_CACHE else VideoDecoder
+        self.video = video(os.path.join("data/video/underwater.mp4"), self.display.get_size())
+        self.audio = None if offline else pygame.mixer.Sound(os.path.join("data/audio/aquarium-ambience.mp3"))
         self.muted = False
 
         # fish importing
         inbound = os.path.join("data", "inbound")
         outbound = os.path.join("data", "outbound")
-        scanner = Scanner(outbound)
+        self.fishes = FishIndex(FISH_INDEX)
+        self.scans = ScanPipeline(outbound, workers=SCAN_WORKERS, index=FISH_INDEX)
+        self.inbound = ImageFileEventHandler(self.scans, outbound, self.fishes, True, self.load_boid)
         self.observer = Observer()
-        self.observer.schedule(ImageFileEventHandler(scanner, outbound, True, self.load_boid), inbound, recursive=True)
+        self.observer.schedule(self.inbound, inbound, recursive=True)
+        self.uploads = (
+            UploadServer(self.scans, self.fishes, port=UPLOAD_PORT, callback=self.load_boid)
+            if UPLOAD_PORT and not offline
+            else None
+        )
         self.capture = Capture(
-            scanner, outbound, size=(640, 480), pos=(self.display.get_width() / 2 - 320, 0), callback=self.load_boid
+            Scanner(outbound),
+            self.scans,
+            size=(640, 480),
+            pos=(self.display.get_width() / 2 - 320, 0),
+            callback=self.add_boid,
         )
 
         # objects
         self.movement = [False, False, False, False]
-        self.flock = Flock(max=25, area=(100, 100, self.display.get_width() - 100, self.display.get_height() - 100))
+        self.flock = Flock(
+            max=25,
+            area=(100, 100, self.display.get_width() - 100, self.display.get_height() - 100),
+            neighbors=NEIGHBORS,
+            rotation_steps=ROTATION_STEPS,
+            seed=SEED,
+        )
+        self.recorder = Recorder(RECORD, self.flock) if RECORD else None
+
+        # quality governor
+        self.governor = (
+            Governor(self.quality_levels(), 1 / FPS, log=GOVERNOR_LOG) if GOVERNOR and not offline else None
+        )
         self.load_boids(outbound)
 
     def run(self):
+        # first, as it fails when the port is in use
+        if self.uploads:
+            self.uploads.start()
         self.observer.start()
+        self.inbound.start()
+        self.video.start()
         self.toggle_audio()
 
         # main loop
@@ -59,13 +120,13 @@ class Aquarium:
             running = True
             while running:
 
-                self.update()
+                self.update(self.clock.get_time() / 1000)
                 self.render()
 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         running = False
-                    if event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE):
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
                         self.on_resize()
                     if event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_ESCAPE:
@@ -84,6 +145,8 @@ class Aquarium:
                             self.toggle_audio()
                         if event.key == pygame.K_c:
                             self.toggle_capture()
+                        if event.key == pygame.K_p:
+                            self.toggle_profiler()
                     if event.type == pygame.KEYUP:
                         if event.key in (pygame.K_LEFT, pygame.K_a):
                             self.movement[0] = False
@@ -94,71 +157,146 @@ class Aquarium:
                         if event.key in (pygame.K_DOWN, pygame.K_s):
                             self.movement[3] = False
 
+                self.profiler.end_frame(
+                    boids=self.flock.count,
+                    food=len(self.flock.food),
+                    quality=self.governor.level if self.governor else 0,
+                )
                 self.clock.tick(FPS)
+                if self.governor:
+                    # time spent on the frame, without waiting for the next one
+                    self.governor.update(self.clock.get_rawtime() / 1000)
         finally:
             # clean up
             self.stop()
 
     def stop(self):
-        self.observer.stop()
-        self.observer.join()
-        self.video.release()
+        if self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
+        self.inbound.stop()
+        print(f"Inbound: {self.inbound.counters}")
+        if self.uploads:
+            self.uploads.stop()
+            print(f"Uploads: {self.uploads.counters}")
+        self.scans.close()
+        self.fishes.close()
+        self.video.stop()
+        print(f"Video: {self.video.dropped} dropped, {self.video.late} late frames")
         self.capture.close()
+        if self.recorder:
+            self.recorder.close()
+            print(f"Recorded {self.recorder.ticks} ticks with seed {self.flock.seed} to {RECORD}")
         pygame.quit()
 
     def load_boids(self, path):
-        # load 25 boids reverse sorted by date, but in sorted order, so that the oldest is at index 0
-        for file in sorted(sorted(os.listdir(path), reverse=True)[:25]):
-            self.load_boid(os.path.join(path, file))
+        # load the newest 25 fishes from the index, oldest first, so that the oldest is at index 0
+        if not self.fishes.count():
+            # first start with the index, add the fishes scanned before
+            self.fishes.import_files(path)
+        for file, template_id, thumbnail in self.fishes.latest(25):
+            if thumbnail:
+                self.flock.add(load_thumbnail(thumbnail))
 
     def load_boid(self, file):
-        match = re.search("^.*[0-9]{20}-([0-9]{1}).png", file)
-        if match:
-            # load image
-            img = pygame.image.load(os.path.join(file)).convert_alpha()
-            # scale down
-            img = pygame.transform.smoothscale(img, (100, 142))
-            # make them look "right" (which is 0 degree angle in pygame)
-            img = pygame.transform.flip(pygame.transform.rotate(img, -90), False, True)
-            # add fish to flock, match.group(1) == type of fisch from filename
-            self.flock.add(img)
+        # add a fish scanned in the background, its thumbnail has been indexed by the scanner
+        thumbnail = self.fishes.thumbnail(file)
+        if thumbnail:
+            self.flock.add(load_thumbnail(thumbnail))
+
+    def add_boid(self, image):
+        # add a scanned BGRA image to the flock, its file is written in the background
+        self.flock.add(load_thumbnail(encode_thumbnail(image)))
+
+    def quality_levels(self):
+        # (name, function(high)) in the order they are lowered by the governor
+        flock = self.flock
+        return [
+            ("presenter smoothing", self.presenter.set_smooth),
+            ("rotation steps", lambda high: flock.set_rotation_steps(ROTATION_STEPS if high else ROTATION_STEPS // 3)),
+            ("predator animation", lambda high: setattr(flock, "predator_interval", 1 if high else 3)),
+            ("fish count", lambda high: flock.set_limit(flock.max_boids if high else flock.max_boids * 3 // 5)),
+        ]
 
     def on_resize(self):
-        self.scale = min(
-            self.screen.get_width() / self.display.get_width(), self.screen.get_height() / self.display.get_height()
-        )
-        self.margin[0] = int((self.screen.get_width() - self.display.get_width() * self.scale) // 2)
-        self.margin[1] = int((self.screen.get_height() - self.display.get_height() * self.scale) // 2)
+        self.presenter.resize()
 
-    def update(self):
-        self.flock.update(
-            self.clock.get_time() / 1000, (self.movement[1] - self.movement[0], self.movement[3] - self.movement[2])
-        )
-        if self.capture.isCapturing():
-            self.capture.update()
+    def update(self, elapsed):
+        # advance the simulation by elapsed seconds in fixed steps, the remainder carries over to the next frame
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.timestep and steps < MAX_SIMULATION_STEPS:
+            self.profiler.measure(
+                "flock",
+                self.flock.update,
+                self.timestep,
+                (self.movement[1] - self.movement[0], self.movement[3] - self.movement[2]),
+            )
+            self.accumulator -= self.timestep
+            steps += 1
+        # drop the time we could not catch up on, instead of spiraling behind
+        self.accumulator = min(self.accumulator, self.timestep)
+
+        # add fishes scanned in the background
+        self.profiler.measure("scans", self.scans.process)
 
     def render(self):
+        self.compose()
+        self.profiler.measure("present", self.presenter.present, self.display)
+
+    def compose(self, video_time=None):
+        # draw the tank into the display surface
         self.display.fill((0, 0, 0, 0))
-        self.display.blit(self.get_video_frame(), (0, 0))
-        self.flock.render(self.display)
+        frame = self.profiler.measure("video", self.get_video_frame, video_time)
+        self.profiler.measure("render video", self.display.blit, frame, (0, 0))
+        self.profiler.measure("render flock", self.flock.render, self.display, self.accumulator / self.timestep)
 
         if self.capture.isCapturing():
-            self.capture.render(self.display)
-
-        self.screen.fill((0, 0, 0, 0))
-        self.screen.blit(pygame.transform.smoothscale_by(self.display, self.scale), self.margin)
-        pygame.display.flip()
-
-    def get_video_frame(self):
-        if not self.video.isOpened():
-            return pygame.Surface(self.display.get_size())
-        success, frame = self.video.read()
-        if success:
-            surface = pygame.image.frombuffer(frame.tobytes(), frame.shape[1::-1], "BGR")
-            return surface
-        else:
-            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            return self.get_video_frame()
+            self.profiler.measure("render capture", self.capture.render, self.display)
+
+        lines = [f"{self.clock.get_fps():.1f} fps, video {self.video.dropped} dropped {self.video.late} late"]
+        if self.governor:
+            lines.append(f"quality level {self.governor.level}/{len(self.governor.levels)}")
+        if self.capture.isCapturing():
+            lines.append(f"capture thread {self.capture.process_time * 1000:.2f} ms")
+        self.profiler.render(self.display, self.flock.font, lines)
+
+    def get_video_frame(self, video_time=None):
+        # offline, wait for the video frame at video_time instead of following the wall clock
+        return self.video.get_frame(video_time, block=video_time is not None)
+
+    def render_offline(self, output, frames, size=None, script=None):
+        # render frames at FPS as fast as possible into output (see FrameWriter), scaled to size.
+        # script maps frame numbers to lists of actions: "feed", "left", "right", "up", "down" or "stop".
+        # returns the rendered frames per second.
+        size = tuple(size or self.display.get_size())
+        scaled = None if size == self.display.get_size() else pygame.Surface(size)
+        writer = FrameWriter(output, size, FPS)
+        directions = ["left", "right", "up", "down"]
+        self.video.start()
+        try:
+            start = time.perf_counter()
+            for frame in range(frames):
+                for action in (script or {}).get(frame, []):
+                    if action == "feed":
+                        self.flock.feed()
+                    elif action == "stop":
+                        self.movement = [False, False, False, False]
+                    else:
+                        # a direction replaces its opposite
+                        index = directions.index(action)
+                        self.movement[index ^ 1] = False
+                        self.movement[index] = True
+
+                self.update(1 / FPS)
+                self.compose(frame / FPS)
+                if scaled is not None:
+                    pygame.transform.smoothscale(self.display, size, scaled)
+                writer.write(self.display if scaled is None else scaled)
+            return frames / (time.perf_counter() - start)
+        finally:
+            writer.close()
+            self.stop()
 
     def toggle_audio(self):
         self.muted = not self.muted
@@ -168,6 +306,10 @@ class Aquarium:
             self.audio.set_volume(1.0)
             self.audio.play(-1)
 
+    def toggle_profiler(self):
+        self.profiler.toggle()
+        self.flock.timings = self.profiler.frame if self.profiler.enabled else None
+
     def toggle_capture(self):
         if self.capture.isCapturing():
             self.capture.close()
@@ -1,26 +1,36 @@
 import math
 import os
+import threading
+import time
 import cv2
 import numpy as np
 import pygame
-import time
-from datetime import datetime
 
 
 class Capture:
 
-    def __init__(self, scanner, outbound, size=(320, 240), pos=(0, 0), callback=None) -> None:
+    def __init__(self, scanner, pipeline, size=(320, 240), pos=(0, 0), callback=None) -> None:
+        # frames are scanned in memory with scanner, the pipeline saves scans and hands them to the main loop
         self.scanner = scanner
-        self.outbound = outbound
-        self.temp = os.path.join("data/temp")
+        self.pipeline = pipeline
         self.size = size
         self.pos = pos
         self.callback = callback
 
-        self.capture = None
-        self.last_frame_ts = 0
+        # the camera is owned by a worker thread, which detects markers and prepares the preview
+        self.thread = None
+        self.running = False
+        self.scanning = False
+
+        # latest preview and detection state ("instructions", "closer" or None), set by the worker thread
         self.frame = pygame.Surface(size)
         self.frame.fill((0, 0, 0))
+        self.state = None
+        # seconds the worker thread spent on the last frame
+        self.process_time = 0.0
+
+        # markers of the last frame with all markers, to search only around them in the next frame
+        self.tracked = {}
 
         self.aruco_detector = cv2.aruco.ArucoDetector(
             dictionary=cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
@@ -28,92 +38,144 @@ class Capture:
 
         self.instructions = pygame.image.load(os.path.join("data/images/capture/instructions.png")).convert_alpha()
         self.closer = pygame.image.load(os.path.join("data/images/capture/closer.png")).convert_alpha()
+        self.overlays = {}
 
     def open(self):
-        try:
-            self.capture = cv2.VideoCapture(0)
-        except Exception:
-            pass
+        if self.running:
+            return
+        self.frame = pygame.Surface(self.size)
+        self.frame.fill((0, 0, 0))
+        self.state = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
 
     def close(self):
-        try:
-            self.capture.close()
-        except Exception:
-            pass
-        finally:
-            self.capture = None
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
 
     def isCapturing(self):
-        return isinstance(self.capture, cv2.VideoCapture) and self.capture.isOpened()
-
-    def update(self):
-        if self.isCapturing() and time.time() - self.last_frame_ts > (1.0 / 25):
-            success, frame = self.capture.read()
-            if success:
-                show_instructions = False
-                show_come_closer = False
-
-                # get frame dimensions
-                height, width, channels = frame.shape
-                diagonal = math.hypot(height, width)
-
-                # convert to gray color
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-                # detect aruco markers
-                (markers, ids, rejected) = self.aruco_detector.detectMarkers(gray)
-
-                # if all expected markers are detected in frame
-                if len(markers) == 5:
-                    # calculate the centers of each marker
-                    corners = []
-                    for marker in markers:
-                        marker = marker.reshape(4, 2)
-                        corners.append(
-                            (
-                                marker[0][0] + (marker[2][0] - marker[0][0]) / 2,
-                                marker[0][1] + (marker[2][1] - marker[0][1]) / 2,
-                            )
-                        )
-
-                    # calculate the diagonal between min/max corner
-                    corners = np.array(corners)[: np.newaxis]
-                    corners_diagonal = math.hypot(
-                        np.max(np.max(corners, 0)) - np.min(np.min(corners, 0)),
-                        np.max(np.max(corners, 1)) - np.min(np.min(corners, 1)),
-                    )
+        return self.running
 
-                    # if the drawing is close enough scan it
-                    if (corners_diagonal / diagonal) > 0.75:
-                        date = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                        temp_file = os.path.join(self.temp, f"{date}.png")
-                        cv2.imwrite(temp_file, frame)
-                        image_file = self.scanner.scan(temp_file)
-                        if image_file is not None:
-                            if self.callback:
-                                self.callback(image_file)
-                                self.close()
-                    else:
-                        show_come_closer = True
+    def run(self):
+        capture = cv2.VideoCapture(0)
+        try:
+            if not capture.isOpened():
+                return
+            self.tracked = {}
+            while self.running:
+                success, frame = capture.read()
+                if success:
+                    start = time.perf_counter()
+                    self.process(frame)
+                    self.process_time = time.perf_counter() - start
                 else:
-                    show_instructions = True
-
-                # draw frame in pygame
-                pg_frame = pygame.image.frombuffer(frame.tobytes(), frame.shape[1::-1], "BGR")
-                scale = min(self.size[0] / pg_frame.get_width(), self.size[1] / pg_frame.get_height())
-                self.frame = pygame.transform.scale_by(pg_frame, scale)
-                if show_instructions:
-
-                    self.frame.blit(pygame.transform.scale(self.instructions, self.frame.get_size()), (0, 0))
-                elif show_come_closer:
-                    self.frame.blit(pygame.transform.scale(self.closer, self.frame.get_size()), (0, 0))
-
-                self.last_frame_ts = time.time()
-
+                    # show black screen if we've got no image from camera
+                    frame = pygame.Surface(self.size)
+                    frame.fill((0, 0, 0, 0))
+                    self.frame = frame
+        finally:
+            capture.release()
+            self.running = False
+
+    def process(self, frame):
+        state = None
+
+        # get frame dimensions
+        height, width, channels = frame.shape
+        diagonal = math.hypot(height, width)
+
+        # convert to gray color
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        # detect aruco markers
+        markers = self.detect(gray)
+
+        # if all expected markers are detected in frame
+        if len(markers) == 5:
+            # calculate the centers of each marker
+            corners = []
+            for marker in markers.values():
+                corners.append(
+                    (
+                        marker[0][0] + (marker[2][0] - marker[0][0]) / 2,
+                        marker[0][1] + (marker[2][1] - marker[0][1]) / 2,
+                    )
+                )
+
+            # calculate the diagonal between min/max corner
+            corners = np.array(corners)[: np.newaxis]
+            corners_diagonal = math.hypot(
+                np.max(np.max(corners, 0)) - np.min(np.min(corners, 0)),
+                np.max(np.max(corners, 1)) - np.min(np.min(corners, 1)),
+            )
+
+            # if the drawing is close enough scan it, reusing the detected markers
+            if (corners_diagonal / diagonal) > 0.75:
+                if not self.scanning:
+                    image, template_id = self.scanner.extract(frame, markers)
+                    if image is not None:
+                        self.scanning = True
+                        self.pipeline.save(image, template_id)
+                        self.pipeline.post(None, image, self.on_scanned)
             else:
-                # show black screen if we've got no image from camera
-                self.frame = pygame.Surface(self.size)
-                self.frame.fill((0, 0, 0, 0))
+                state = "closer"
+        else:
+            state = "instructions"
+
+        # draw frame in pygame
+        pg_frame = pygame.image.frombuffer(frame.tobytes(), frame.shape[1::-1], "BGR")
+        scale = min(self.size[0] / pg_frame.get_width(), self.size[1] / pg_frame.get_height())
+        preview = pygame.transform.scale_by(pg_frame, scale)
+        if state:
+            preview.blit(self.overlay(state, preview.get_size()), (0, 0))
+
+        # hand over to the main loop
+        self.frame = preview
+        self.state = state
+
+    def detect(self, gray):
+        # markers by id, searching around the tracked markers if all of them were found in the last frame
+        if len(self.tracked) == 5:
+            markers = {}
+            for id, corners in self.tracked.items():
+                margin = np.ptp(corners, axis=0).max()
+                x0, y0 = np.maximum(np.floor(corners.min(axis=0) - margin), 0).astype(int)
+                x1, y1 = np.ceil(corners.max(axis=0) + margin).astype(int)
+                found = self.detect_markers(gray[y0:y1, x0:x1])
+                if id in found:
+                    markers[id] = found[id] + (x0, y0)
+            if len(markers) == 5:
+                self.tracked = markers
+                return markers
+
+        # search the full frame
+        markers = self.detect_markers(gray)
+        self.tracked = markers if len(markers) == 5 else {}
+        return markers
+
+    def detect_markers(self, gray):
+        (markers, ids, rejected) = self.aruco_detector.detectMarkers(gray)
+        if ids is None:
+            return {}
+        return {id: marker.reshape(4, 2) for marker, id in zip(markers, ids.flatten())}
+
+    def overlay(self, state, size):
+        # instructions scaled to the preview size
+        if (state, size) not in self.overlays:
+            image = self.instructions if state == "instructions" else self.closer
+            self.overlays[(state, size)] = pygame.transform.scale(image, size)
+        return self.overlays[(state, size)]
+
+    def on_scanned(self, file, image):
+        # runs on the main loop
+        self.scanning = False
+        if self.isCapturing():
+            if self.callback:
+                self.callback(image)
+                self.close()
 
     def render(self, surface):
         if self.frame:
@@ -0,0 +1,170 @@
+import os
+import re
+import sqlite3
+import threading
+import cv2
+
+# outbound files are named <timestamp>-<template id>.png, timestamps sort in time order
+FILE_NAME = re.compile(r"^([0-9]{20})-([0-9])\.png$")
+THUMBNAIL_SIZE = (100, 142)
+# thumbnails are the RGBA pixels of fish sprites: scaled to THUMBNAIL_SIZE and turned to face right (0 degrees in
+# pygame), which makes them SPRITE_SIZE. version 1 of the index stores these instead of pngs.
+SPRITE_SIZE = THUMBNAIL_SIZE[::-1]
+VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fishes (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    template_id INTEGER NOT NULL,
+    file TEXT NOT NULL UNIQUE,
+    source_hash TEXT,
+    thumbnail BLOB,
+    archived INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS fishes_latest ON fishes (archived, timestamp);
+CREATE INDEX IF NOT EXISTS fishes_source_hash ON fishes (source_hash);
+"""
+
+
+def encode_thumbnail(image, size=THUMBNAIL_SIZE):
+    # sprite pixels of a BGRA cutout, which the aquarium loads without decoding, scaling or rotating
+    image = cv2.cvtColor(cv2.resize(image, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2RGBA)
+    return image[::-1, ::-1].transpose(1, 0, 2).tobytes()
+
+
+class FishIndex:
+    # imported fishes in sqlite, written by scanners in any process, read by the aquarium at startup
+
+    def __init__(self, path=os.path.join("data", "cache", "fishes.db")) -> None:
+        self.path = path
+        # one connection per thread, sqlite connections must not be shared between threads
+        self.local = threading.local()
+        connection = self.connection()
+        connection.executescript(SCHEMA)
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version < VERSION:
+            # thumbnails of older versions are created again from the files on first use
+            connection.execute("UPDATE fishes SET thumbnail = NULL")
+            connection.execute(f"PRAGMA user_version = {VERSION}")
+
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # readers do not block the writing scanner processes
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return self.local.connection
+
+    def add(self, file, template_id, timestamp, source_hash=None, thumbnail=None):
+        self.connection().execute(
+            "INSERT OR REPLACE INTO fishes (timestamp, template_id, file, source_hash, thumbnail) VALUES (?, ?, ?, ?, ?)",
+            (timestamp, int(template_id), file, source_hash, thumbnail),
+        )
+
+    def latest(self, count):
+        # (file, template id, thumbnail) of the newest count fishes, oldest first.
+        # thumbnails are created on first use for fishes imported from files.
+        connection = self.connection()
+        rows = connection.execute(
+            "SELECT id, file, template_id, thumbnail FROM fishes WHERE archived = 0 ORDER BY timestamp DESC LIMIT ?",
+            (count,),
+        ).fetchall()
+        fishes = []
+        for id, file, template_id, data in reversed(rows):
+            if data is None:
+                data = self.create_thumbnail(id, file)
+            fishes.append((file, template_id, data))
+        return fishes
+
+    def latest_ids(self, count, after=0):
+        # ids of the newest count fishes added after the fish with id after, oldest first
+        connection = self.connection()
+        rows = connection.execute(
+            "SELECT id FROM fishes WHERE archived = 0 AND id > ? ORDER BY timestamp DESC LIMIT ?", (after, count)
+        ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def thumbnail(self, file):
+        row = self.connection().execute("SELECT id, thumbnail FROM fishes WHERE file = ?", (file,)).fetchone()
+        if row is None:
+            return None
+        return row[1] if row[1] is not None else self.create_thumbnail(row[0], file)
+
+    def thumbnail_by_id(self, id):
+        row = self.connection().execute("SELECT file, thumbnail FROM fishes WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            return None
+        return row[1] if row[1] is not None else self.create_thumbnail(id, row[0])
+
+    def create_thumbnail(self, id, file):
+        image = cv2.imread(file, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        data = encode_thumbnail(image)
+        self.connection().execute("UPDATE fishes SET thumbnail = ? WHERE id = ?", (data, id))
+        return data
+
+    def hashes(self):
+        # source hashes of all imported files, archived ones included
+        rows = self.connection().execute("SELECT source_hash FROM fishes WHERE source_hash IS NOT NULL")
+        return {row[0] for row in rows}
+
+    def count(self, archived=False):
+        connection = self.connection()
+        (count,) = connection.execute("SELECT COUNT(*) FROM fishes WHERE archived = ?", (int(archived),)).fetchone()
+        return count
+
+    def import_files(self, outbound, scanned=os.path.join("data", "cache", "scanned.txt")):
+        # add outbound files missing in the index, with source hashes of a "<hash> <file>" list if there is one
+        hashes = {}
+        if scanned and os.path.isfile(scanned):
+            with open(scanned) as lines:
+                for line in lines:
+                    if line.strip():
+                        digest, file = line.rstrip("\n").split(" ", 1)
+                        hashes[os.path.basename(file)] = digest
+        rows = []
+        for name in os.listdir(outbound):
+            match = FILE_NAME.match(name)
+            if match:
+                rows.append((match.group(1), int(match.group(2)), os.path.join(outbound, name), hashes.get(name)))
+        connection = self.connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR IGNORE INTO fishes (timestamp, template_id, file, source_hash) VALUES (?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def archive(self, keep, archive):
+        # move the files of all but the newest keep fishes to archive and drop their thumbnails.
+        # archived fishes stay in the index, so that their photos are not imported again.
+        os.makedirs(archive, exist_ok=True)
+        connection = self.connection()
+        rows = connection.execute(
+            "SELECT id, file FROM fishes WHERE archived = 0 ORDER BY timestamp DESC LIMIT -1 OFFSET ?", (keep,)
+        ).fetchall()
+        updates = []
+        for id, file in rows:
+            target = os.path.join(archive, os.path.basename(file))
+            try:
+                os.replace(file, target)
+            except FileNotFoundError:
+                pass
+            updates.append((target, id))
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany("UPDATE fishes SET archived = 1, thumbnail = NULL, file = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def compact(self):
+        # give the space of dropped thumbnails back to the file system
+        connection = self.connection()
+        connection.execute("VACUUM")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        if hasattr(self.local, "connection"):
+            self.local.connection.close()
+            del self.local.connection
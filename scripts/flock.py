@@ -1,6 +1,6 @@
 import math
 import os
-import random
+import time
 import numpy as np
 import pygame
 
@@ -10,13 +10,17 @@ class Flock:
         self,
         max=25,
         area=(0, 0, 0, 0),
+        neighbors="dense",
+        rotation_steps=72,
+        headless=False,
+        seed=None,
     ) -> None:
         # limits
         self.max_boids = max
-        self.min_position = np.array(area[:2])
-        self.max_position = np.array(area[2:])
-        self.min_velocity = np.array([-40, -40])
-        self.max_velocity = np.array([40, 40])
+        self.min_position = np.array(area[:2], np.float32)
+        self.max_position = np.array(area[2:], np.float32)
+        self.min_velocity = np.array([-40, -40], np.float32)
+        self.max_velocity = np.array([40, 40], np.float32)
 
         # forces
         self.turnaround_strength = 20
@@ -30,95 +34,281 @@ class Flock:
         self.attraction_distance = 200.0
         self.attraction_strength = 2.0
 
-        # boids
-        self.boids = []
-        self.positions = np.empty((0, 2), float)
-        self.velocities = np.empty((0, 2), float)
+        # neighbor search for pairwise forces: "dense" compares all boids, "grid" uses a uniform grid
+        if neighbors not in ("dense", "grid"):
+            raise ValueError(f"Unknown neighbor search: {neighbors}")
+        self.neighbor_search = neighbors
+        self.neighbors = None
+
+        # boids are stored in max_boids preallocated slots, only the first count slots are alive.
+        # once all slots are taken, new boids replace the oldest one, which rotates through the slots.
+        self.boids = [None] * self.max_boids
+        self.position_slots = np.zeros((self.max_boids, 2), np.float32)
+        self.velocity_slots = np.zeros((self.max_boids, 2), np.float32)
+        self.count = 0
+        self.oldest = 0
+        # live boids can be limited below max_boids, the oldest ones beyond the limit are parked (see set_limit)
+        self.limit = self.max_boids
+        self.parked = []
+        self.positions = self.position_slots[: self.count]
+        self.velocities = self.velocity_slots[: self.count]
+
+        # positions before the last update, to interpolate between simulation steps when rendering
+        self.previous_position_slots = np.zeros((self.max_boids, 2), np.float32)
+
+        # scratch buffers of the force pipeline, so that a tick allocates no arrays that grow with the flock:
+        # accumulated forces, vectors per boid with their squares, squared lengths and masks
+        self.force_slots = np.zeros((self.max_boids, 2), np.float32)
+        self.vector_slots = np.zeros((self.max_boids, 2), np.float32)
+        self.square_slots = np.zeros((self.max_boids, 2), np.float32)
+        self.length_slots = np.zeros(self.max_boids, np.float32)
+        self.close_slots = np.zeros(self.max_boids, bool)
+        self.mask_slots = np.zeros((self.max_boids, 2), bool)
+        self.center = np.zeros(2, np.float32)
+        # keys of the boids sorted by x for the eaten food search: whole pixels of x, and the slot in the lower 32 bits
+        self.slot_numbers = np.arange(self.max_boids, dtype=np.int64)
+        self.sorted_keys = np.zeros(self.max_boids, np.int64)
+        # the same per pair of boids for the dense neighbor search
+        if self.neighbor_search == "dense":
+            self.pair_vectors = np.zeros((self.max_boids, self.max_boids, 2), np.float32)
+            self.pair_values = np.zeros((self.max_boids, self.max_boids, 2), np.float32)
+            self.pair_lengths = np.zeros((self.max_boids, self.max_boids), np.float32)
+            self.pair_mask = np.zeros((self.max_boids, self.max_boids), bool)
+
+        # rotated boid images are cached per slot, quantized to rotation_steps headings (0 disables the cache).
+        # more steps look smoother, but each cached heading holds another surface per boid.
+        self.rotation_steps = rotation_steps
+        self.sprites = [None] * self.max_boids
 
         # predator
-        self.predator = np.array(self.max_position, float)
+        self.predator = np.array(self.max_position, np.float32)
+        self.previous_predator = self.predator.copy()
         self.predator_speed = 50
-        self.predator_images = self.load_images(os.path.join("data/images/submarine"))
+        self.predator_path = os.path.join("data/images/submarine")
+        self.predator_frames = len([file for file in os.listdir(self.predator_path) if file.endswith(".png")])
         self.predator_frame = 0
         self.predator_flip = True
+        # ticks per animation frame, and the flipped image of the current frame
+        self.predator_interval = 1
+        self.predator_ticks = 0
+        self.predator_image = None
+        self.predator_key = None
+
+        # food positions in preallocated slots like the boids, the capacity grows when feeding
+        self.food_slots = np.zeros((0, 2), np.float32)
+        self.food = self.food_slots[:0]
+        self.food_speed = 20
+        self.food_collision_distance = 20
+        self.grow_food(32)
+
+        # all randomness comes from one seeded generator, so that a recorded session replays exactly
+        self.seed = int(np.random.SeedSequence().entropy % 2**63) if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        # optional Recorder, which logs every input to the simulation
+        self.recorder = None
+
+        # accumulated seconds per update stage, only measured if set to a dict
+        self.timings = None
+
+        # pygame assets, the simulation runs without them (and without a display) if headless
+        self.predator_images = []
+        self.food_surface = None
+        self.font = None
+        if not headless:
+            self.load_assets()
+
+    def load_assets(self):
+        self.predator_images = self.load_images(self.predator_path)
 
-        # food
         self.food_surface = pygame.Surface((10, 10))
         self.food_surface.set_colorkey((0, 0, 0, 0))
         pygame.draw.circle(self.food_surface, "brown", (5, 5), 5)
-        self.food = []
-        self.food_speed = 20
-        self.food_collision_distance = 20
 
         # debug
         self.font = pygame.font.Font(pygame.font.get_default_font(), 20)
 
     def add(self, image):
-        if len(self.boids) >= self.max_boids:
-            # remove first(=oldest) element from array
-            self.boids.pop(0)
-            self.positions = np.delete(self.positions, 0, 0)
-            self.velocities = np.delete(self.velocities, 0, 0)
+        if self.recorder:
+            self.recorder.add()
+        if self.count < self.limit:
+            # take the next free slot, positions and velocities are views on the live slots
+            slot = self.count
+            self.count += 1
+            self.positions = self.position_slots[: self.count]
+            self.velocities = self.velocity_slots[: self.count]
+        else:
+            # replace oldest boid
+            slot = self.oldest
+            self.oldest = (self.oldest + 1) % self.count
+
+        self.place(slot, image)
+        return slot
+
+    def place(self, slot, image):
+        # put a boid into a live slot, at a random position and velocity
+        self.boids[slot] = image
+        self.sprites[slot] = [None] * (2 * self.rotation_steps)
+        self.positions[slot] = self.random2d(self.min_position, self.max_position)
+        self.velocities[slot] = self.random2d(self.min_velocity, self.max_velocity)
+        self.previous_position_slots[slot] = self.positions[slot]
+
+    def order(self):
+        # live slots from oldest to newest
+        return (np.arange(self.count) + self.oldest) % max(self.count, 1)
+
+    def set_limit(self, limit):
+        # limit the live boids, parking the oldest ones beyond limit, which come back when it is raised again
+        if self.recorder:
+            self.recorder.limit(limit)
+        self.limit = max(1, min(limit, self.max_boids))
 
-        # append new boid
-        self.boids.append(image)
-        self.positions = np.append(self.positions, self.random2d(self.min_position, self.max_position), axis=0)
-        self.velocities = np.append(self.velocities, self.random2d(self.min_velocity, self.max_velocity), axis=0)
+        # park the oldest boids beyond the limit. parked boids are older than the live ones, those that come back
+        # take the first slots, followed by the kept boids, oldest first, so that new boids replace them first.
+        order = self.order()
+        drop, keep = order[: max(0, self.count - self.limit)], order[max(0, self.count - self.limit) :]
+        self.parked += [self.boids[slot] for slot in drop]
+        back = min(len(self.parked), self.limit - len(keep))
+        returning = self.parked[len(self.parked) - back :]
+        del self.parked[len(self.parked) - back :]
+        count = back + len(keep)
+        for slots in (self.position_slots, self.velocity_slots, self.previous_position_slots):
+            slots[back:count] = slots[keep]
+        self.boids = [None] * back + [self.boids[slot] for slot in keep] + [None] * (self.max_boids - count)
+        self.sprites = [None] * back + [self.sprites[slot] for slot in keep] + [None] * (self.max_boids - count)
+        self.count = count
+        self.oldest = 0
+        self.positions = self.position_slots[: self.count]
+        self.velocities = self.velocity_slots[: self.count]
+        for slot, image in enumerate(returning):
+            self.place(slot, image)
 
     def feed(self):
-        item = [random.randint(self.min_position[0], self.max_position[0]), 0]
-        self.food.append(item)
+        if self.recorder:
+            self.recorder.feed()
+        count = len(self.food)
+        if count == len(self.food_slots):
+            self.grow_food(2 * count)
+        x = self.rng.integers(int(self.min_position[0]), int(self.max_position[0]), endpoint=True)
+        self.food_slots[count] = (x, 0)
+        self.food = self.food_slots[: count + 1]
+
+    def grow_food(self, capacity):
+        # reallocate the food slots and the scratch buffers per food item, and per food item and boid for attraction
+        food_slots = np.zeros((capacity, 2), np.float32)
+        food_slots[: len(self.food)] = self.food
+        self.food_slots = food_slots
+        self.food = self.food_slots[: len(self.food)]
+        self.food_drift = np.zeros(capacity, np.float32)
+        self.food_removed = np.zeros(capacity, bool)
+        self.food_eaten = np.zeros(capacity, bool)
+        self.food_vectors = np.zeros((capacity, self.max_boids, 2), np.float32)
+        self.food_squares = np.zeros((capacity, self.max_boids, 2), np.float32)
+        self.food_boid_lengths = np.zeros((capacity, self.max_boids), np.float32)
+        self.food_boid_mask = np.zeros((capacity, self.max_boids), bool)
 
     def random2d(self, lower_limits=np.array([0, 0]), upper_limits=np.array([0, 0])):
         range = upper_limits - lower_limits
-        rand = lower_limits[:, np.newaxis] + np.random.rand(2, 1) * range[:, np.newaxis]
+        rand = lower_limits[:, np.newaxis] + self.rng.random((2, 1)) * range[:, np.newaxis]
         rand = rand.reshape(1, 2)
         return rand
 
     def update(self, timestep, predator_movement):
-        self.update_predator(timestep, predator_movement)
-        self.update_food(timestep)
+        if self.recorder:
+            self.recorder.tick(timestep, predator_movement)
+        self.measure("predator", self.update_predator, timestep, predator_movement)
+        self.measure("food", self.update_food, timestep)
         self.update_boids(timestep)
 
+    def measure(self, name, function, *args):
+        # call function, adding its duration to timings when measuring
+        if self.timings is None:
+            return function(*args)
+        start = time.perf_counter()
+        result = function(*args)
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        return result
+
     def update_boids(self, timestep):
-        # apply forces
-        self.velocities += timestep * sum(
-            force()
-            for force in [
-                self.cohesion_force,
-                self.separation_force,
-                self.alignment_force,
-                self.attraction_force,
-                self.flee_force,
-                self.turnaround_force,
-            ]
+        if not self.count:
+            # an empty tank, e.g. before the first fish was scanned
+            return
+        forces = self.force_slots[: self.count]
+        forces.fill(0)
+
+        # find nearby boids once per tick, shared by all pairwise forces
+        self.neighbors = self.measure(
+            "neighbors", self.find_neighbors, max(self.separation_distance, self.alignment_distance)
         )
 
-        # restrict to min/max velocity
-        self.velocities = np.clip(self.velocities, self.min_velocity, self.max_velocity)
+        # accumulate forces in place
+        for force in [
+            self.cohesion_force,
+            self.separation_force,
+            self.alignment_force,
+            self.attraction_force,
+            self.flee_force,
+            self.turnaround_force,
+        ]:
+            self.measure(force.__name__, force, forces)
+
+        # apply forces, restricted to min/max velocity
+        forces *= timestep
+        self.velocities += forces
+        np.clip(self.velocities, self.min_velocity, self.max_velocity, out=self.velocities)
 
         # move boids
-        self.positions += timestep * self.velocities
+        self.previous_position_slots[: self.count] = self.positions
+        np.multiply(self.velocities, timestep, out=forces)
+        self.positions += forces
 
     def update_food(self, timestep):
-        for item in self.food.copy():
-            item[1] += timestep * self.food_speed
-            item[0] += math.cos(item[1] / math.pi) / 100 * self.food_speed
-            if item[1] > self.max_position[1]:
-                self.food.remove(item)
-                continue
-            for pos in self.positions:
-                if (
-                    abs(pos[0] - item[0]) < self.food_collision_distance
-                    and abs(pos[1] - item[1]) < self.food_collision_distance
-                    and item in self.food
-                ):
-                    self.food.remove(item)
+        count = len(self.food)
+        if not count:
+            return
+        drift = self.food_drift[:count]
+        self.food[:, 1] += timestep * self.food_speed
+        np.divide(self.food[:, 1], math.pi, out=drift)
+        np.cos(drift, out=drift)
+        drift *= self.food_speed / 100
+        self.food[:, 0] += drift
+
+        # remove food that sank to the ground or got eaten by any boid
+        remove = self.food_removed[:count]
+        np.greater(self.food[:, 1], self.max_position[1], out=remove)
+        if len(self.positions):
+            remove |= self.eaten_food()
+        if remove.any():
+            kept = self.food[~remove]
+            self.food_slots[: len(kept)] = kept
+            self.food = self.food_slots[: len(kept)]
+
+    def eaten_food(self):
+        # food items with a boid closer than food_collision_distance on both axes.
+        # boids are sorted by x, so only those in the x range of an item are compared.
+        distance = self.food_collision_distance
+        keys = self.sorted_keys[: self.count]
+        np.copyto(keys, self.positions[:, 0], casting="unsafe")
+        keys <<= 32
+        keys |= self.slot_numbers[: self.count]
+        keys.sort()
+        start = np.searchsorted(keys, (self.food[:, 0] - distance).astype(np.int64) << 32, "left")
+        counts = np.searchsorted(keys, ((self.food[:, 0] + distance).astype(np.int64) + 1) << 32, "left") - start
+        # pairs of food items and the slots of the boids in their x range
+        items = np.repeat(np.arange(len(self.food)), counts)
+        boids = keys[
+            np.repeat(start, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        ]
+        boids &= 0xFFFFFFFF
+        are_close = (np.abs(self.positions[boids] - self.food[items]) < distance).all(-1)
+        eaten = np.bincount(items[are_close], minlength=len(self.food))
+        return np.greater(eaten, 0, out=self.food_eaten[: len(self.food)])
 
     def update_predator(self, timestep, predator_movement):
         # predator movement
-        self.predator += timestep * np.array(predator_movement) * self.predator_speed
-        self.predator = np.clip(self.predator, self.min_position, self.max_position)
+        self.previous_predator[:] = self.predator
+        self.predator[0] += timestep * predator_movement[0] * self.predator_speed
+        self.predator[1] += timestep * predator_movement[1] * self.predator_speed
+        np.clip(self.predator, self.min_position, self.max_position, out=self.predator)
 
         # flip
         if predator_movement[0] < 0:
@@ -127,53 +317,141 @@ class Flock:
             self.predator_flip = False
 
         # update animation frame
-        self.predator_frame = (self.predator_frame + 1) % len(self.predator_images)
+        self.predator_ticks += 1
+        if self.predator_ticks >= self.predator_interval:
+            self.predator_ticks = 0
+            self.predator_frame = (self.predator_frame + 1) % self.predator_frames
 
-    def turnaround_force(self):
+    def turnaround_force(self, forces):
         # boids should turnaround when moving out the designated area
-        forces = []
-        for pos in self.positions:
-            force = [0, 0]
-            if pos[0] < self.min_position[0]:
-                force[0] = self.turnaround_strength
-            if pos[0] > self.max_position[0]:
-                force[0] = -self.turnaround_strength
-            if pos[1] < self.min_position[1]:
-                force[1] = self.turnaround_strength
-            if pos[1] > self.max_position[1]:
-                force[1] = -self.turnaround_strength
-            forces.append(force)
-        return np.array(forces)
-
-    def flee_force(self):
+        mask = self.mask_slots[: self.count]
+        np.less(self.positions, self.min_position, out=mask)
+        np.add(forces, self.turnaround_strength, out=forces, where=mask)
+        np.greater(self.positions, self.max_position, out=mask)
+        np.subtract(forces, self.turnaround_strength, out=forces, where=mask)
+
+    def flee_force(self, forces):
         # boids flee from predator
-        displacements = self.positions[np.newaxis] - self.predator
-        are_close = (displacements**2).sum(-1) ** 0.5 <= self.flee_distance
-        return self.flee_strength * np.where(are_close[..., None], displacements, 0).sum(0)
-
-    def attraction_force(self):
-        if len(self.food):
-            displacements = self.positions[np.newaxis] - np.array(self.food)[:, np.newaxis]
-            are_close = (displacements**2).sum(-1) ** 0.5 <= self.attraction_distance
-            return -self.attraction_strength * np.where(are_close[..., None], displacements, 0).sum(0)
-        return np.empty(shape=(len(self.positions), 2))
-
-    def cohesion_force(self):
+        displacements = self.vector_slots[: self.count]
+        np.subtract(self.positions, self.predator, out=displacements)
+        lengths = self.squared_lengths(displacements, self.square_slots[: self.count], self.length_slots[: self.count])
+        are_close = np.less_equal(lengths, self.flee_distance**2, out=self.close_slots[: self.count])
+        displacements *= self.flee_strength
+        np.add(forces, displacements, out=forces, where=are_close[..., np.newaxis])
+
+    def attraction_force(self, forces):
+        # boids swim towards nearby food
+        count = len(self.food)
+        if not count:
+            return
+        displacements = self.food_vectors[:count, : self.count]
+        np.subtract(self.positions[np.newaxis], self.food[:, np.newaxis], out=displacements)
+        lengths = self.squared_lengths(
+            displacements, self.food_squares[:count, : self.count], self.food_boid_lengths[:count, : self.count]
+        )
+        are_close = np.less_equal(lengths, self.attraction_distance**2, out=self.food_boid_mask[:count, : self.count])
+        force = np.sum(displacements, axis=0, out=self.vector_slots[: self.count], where=are_close[..., np.newaxis])
+        force *= -self.attraction_strength
+        forces += force
+
+    def cohesion_force(self, forces):
         # boids attract each other
-        return self.cohesion_strength * (self.positions.mean(axis=0)[np.newaxis] - self.positions)
+        force = self.vector_slots[: self.count]
+        np.mean(self.positions, axis=0, out=self.center)
+        np.subtract(self.center, self.positions, out=force)
+        force *= self.cohesion_strength
+        forces += force
 
-    def separation_force(self):
+    def separation_force(self, forces):
         # boids avoid collisions
-        displacements = self.positions[np.newaxis] - self.positions[:, np.newaxis]
-        are_close = (displacements**2).sum(-1) ** 0.5 <= self.separation_distance
-        return self.separation_strength * np.where(are_close[..., None], displacements, 0).sum(0)
+        if self.neighbor_search == "dense":
+            displacements, lengths = self.neighbors
+            are_close = self.pair_mask[: self.count, : self.count]
+            np.less_equal(lengths, self.separation_distance**2, out=are_close)
+            force = self.sum_close(displacements, are_close)
+        else:
+            i, j, displacements, lengths = self.neighbors
+            are_close = lengths <= self.separation_distance**2
+            force = self.sum_pairs(j[are_close], displacements[are_close])
+        force *= self.separation_strength
+        forces += force
 
-    def alignment_force(self):
+    def alignment_force(self, forces):
         # boids adapt their velocity to their nearby peers
-        displacements = self.positions[np.newaxis] - self.positions[:, np.newaxis]
-        velocity_differences = self.velocities[np.newaxis] - self.velocities[:, np.newaxis]
-        are_close = (displacements**2).sum(-1) ** 0.5 <= self.alignment_distance
-        return -self.alignment_strength * np.where(are_close[..., None], velocity_differences, 0).mean(0)
+        if self.neighbor_search == "dense":
+            displacements, lengths = self.neighbors
+            are_close = self.pair_mask[: self.count, : self.count]
+            np.less_equal(lengths, self.alignment_distance**2, out=are_close)
+            velocity_differences = self.pair_values[: self.count, : self.count]
+            np.subtract(self.velocities[np.newaxis], self.velocities[:, np.newaxis], out=velocity_differences)
+            force = self.sum_close(velocity_differences, are_close)
+        else:
+            i, j, displacements, lengths = self.neighbors
+            are_close = lengths <= self.alignment_distance**2
+            velocity_differences = self.velocities[j[are_close]] - self.velocities[i[are_close]]
+            force = self.sum_pairs(j[are_close], velocity_differences)
+        # averaged over all boids, like the mean over the full displacement matrix
+        force *= -self.alignment_strength / len(self.positions)
+        forces += force
+
+    def squared_lengths(self, vectors, squares, out):
+        # squared length of each vector along the last axis, squares is a scratch buffer shaped like vectors
+        np.square(vectors, out=squares)
+        return np.add(squares[..., 0], squares[..., 1], out=out)
+
+    def sum_close(self, pair_values, are_close):
+        # sum pairwise values from i to j over all close i per boid j
+        return np.sum(pair_values, axis=0, out=self.vector_slots[: self.count], where=are_close[..., np.newaxis])
+
+    def sum_pairs(self, index, values):
+        # sum pairwise values per boid
+        force = self.vector_slots[: self.count]
+        for axis in range(2):
+            force[:, axis] = np.bincount(index, values[:, axis], len(self.positions))
+        return force
+
+    def find_neighbors(self, radius):
+        # dense: displacements from i to j and squared distances of all pairs, in the pair buffers.
+        # grid: pairs (i, j) of boids within radius, with displacement from i to j and squared distance.
+        if self.neighbor_search == "dense":
+            displacements = self.pair_vectors[: self.count, : self.count]
+            np.subtract(self.positions[np.newaxis], self.positions[:, np.newaxis], out=displacements)
+            lengths = self.squared_lengths(
+                displacements,
+                self.pair_values[: self.count, : self.count],
+                self.pair_lengths[: self.count, : self.count],
+            )
+            return displacements, lengths
+        i, j = self.grid_candidates(radius)
+        displacements = self.positions[j] - self.positions[i]
+        lengths = (displacements**2).sum(-1)
+        are_close = lengths <= radius**2
+        return i[are_close], j[are_close], displacements[are_close], lengths[are_close]
+
+    def grid_candidates(self, radius):
+        # sort boids into cells of size radius, candidates are boids within the 3x3 cells around each boid
+        count = len(self.positions)
+        if count == 0:
+            return np.empty(0, int), np.empty(0, int)
+        cells = np.floor(self.positions / radius).astype(np.int64)
+        cells -= cells.min(0)
+        width = cells[:, 0].max() + 3
+        keys = (cells[:, 1] + 1) * width + cells[:, 0] + 1
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        candidates_i = []
+        candidates_j = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                cell_keys = keys + dy * width + dx
+                start = np.searchsorted(sorted_keys, cell_keys, "left")
+                counts = np.searchsorted(sorted_keys, cell_keys, "right") - start
+                total = counts.sum()
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                candidates_i.append(np.repeat(np.arange(count), counts))
+                candidates_j.append(order[np.repeat(start, counts) + offsets])
+        return np.concatenate(candidates_i), np.concatenate(candidates_j)
 
     def load_images(self, path):
         images = []
@@ -182,25 +460,67 @@ class Flock:
                 images.append(pygame.image.load(os.path.join(path, file)).convert_alpha())
         return images
 
-    def render(self, surface):
-        # predator
-        predator_image = self.predator_images[self.predator_frame]
+    def render(self, surface, alpha=1.0, offset=(0, 0)):
+        # alpha interpolates between the previous (0) and the current (1) simulation step.
+        # offset is the world position of the surface's top left corner, when it shows a part of a larger world.
+        offset = np.asarray(offset, np.float32)
+        predator = self.previous_predator + alpha * (self.predator - self.previous_predator) - offset
+        previous_positions = self.previous_position_slots[: self.count]
+        positions = previous_positions + alpha * (self.positions - previous_positions) - offset
+
+        self.measure("render predator", self.render_predator, surface, predator)
+        self.measure("render food", self.render_food, surface, offset)
+        self.measure("render boids", self.render_boids, surface, positions)
+
+    def render_predator(self, surface, predator):
+        # flip the image only when the animation frame or direction changed
+        if self.predator_key != (self.predator_frame, self.predator_flip):
+            self.predator_key = (self.predator_frame, self.predator_flip)
+            self.predator_image = pygame.transform.flip(
+                self.predator_images[self.predator_frame], self.predator_flip, False
+            )
+        predator_image = self.predator_image
         surface.blit(
-            pygame.transform.flip(predator_image, self.predator_flip, False),
-            (self.predator[0] - predator_image.get_width() / 2, self.predator[1] - predator_image.get_height() / 2),
+            predator_image,
+            (predator[0] - predator_image.get_width() / 2, predator[1] - predator_image.get_height() / 2),
         )
 
-        # food
-        for pos in self.food:
+    def render_food(self, surface, offset):
+        for pos in self.food - offset:
             surface.blit(
                 self.food_surface,
                 (pos[0] - self.food_surface.get_width() / 2, pos[1] - self.food_surface.get_height() / 2),
             )
 
-        # boids
-        for boid, pos, velocity in zip(self.boids, self.positions, self.velocities):
+    def render_boids(self, surface, positions):
+        # newest on top, skipping boids outside of the surface
+        width, height = surface.get_size()
+        for slot in self.order():
+            pos, velocity = positions[slot], self.velocities[slot]
+            if not (-100 < pos[0] < width + 100 and -100 < pos[1] < height + 100):
+                continue
             angle = (math.atan2(-velocity[1], velocity[0]) / math.pi * 180) % 360
             if angle < 0:
                 angle += 360
-            img = pygame.transform.rotate(pygame.transform.flip(boid.copy(), False, velocity[0] < 0), angle)
+            img = self.sprite(slot, angle, velocity[0] < 0)
             surface.blit(img, (pos[0] - img.get_width() // 2, pos[1] - img.get_height() // 2))
+
+    def sprite(self, slot, angle, flip):
+        if not self.rotation_steps:
+            return pygame.transform.rotate(pygame.transform.flip(self.boids[slot], False, flip), angle)
+
+        # look up the nearest cached heading, rotate on first use
+        step = round(angle * self.rotation_steps / 360) % self.rotation_steps
+        index = 2 * step + bool(flip)
+        sprites = self.sprites[slot]
+        if sprites[index] is None:
+            sprites[index] = pygame.transform.rotate(
+                pygame.transform.flip(self.boids[slot], False, flip), step * 360 / self.rotation_steps
+            )
+        return sprites[index]
+
+    def set_rotation_steps(self, rotation_steps):
+        # change the heading resolution, dropping all cached sprites
+        self.rotation_steps = rotation_steps
+        for slot in range(self.count):
+            self.sprites[slot] = [None] * (2 * self.rotation_steps)
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import pygame
+
+
+class FrameWriter:
+    # writes rendered frames to an image sequence (output contains a %d pattern) or pipes them to ffmpeg
+
+    def __init__(self, output, size, fps=25, ffmpeg="ffmpeg") -> None:
+        self.output = output
+        self.size = tuple(size)
+        self.frames = 0
+        self.process = None
+        if "%" in output:
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        else:
+            self.process = subprocess.Popen(
+                [
+                    ffmpeg,
+                    "-loglevel",
+                    "error",
+                    "-y",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "rgb24",
+                    "-s",
+                    f"{self.size[0]}x{self.size[1]}",
+                    "-r",
+                    str(fps),
+                    "-i",
+                    "-",
+                    "-pix_fmt",
+                    "yuv420p",
+                    output,
+                ],
+                stdin=subprocess.PIPE,
+            )
+
+    def write(self, surface):
+        if self.process:
+            self.process.stdin.write(pygame.image.tobytes(surface, "RGB"))
+        else:
+            pygame.image.save(surface, self.output % self.frames)
+        self.frames += 1
+
+    def close(self):
+        if self.process:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
@@ -0,0 +1,54 @@
+import time
+from collections import deque
+
+
+class Governor:
+    # lowers quality step by step while the rolling frame time is over budget, and raises it again with headroom.
+    # levels are (name, function) tuples in the order they are lowered, function(high) switches high/low quality.
+
+    def __init__(self, levels, budget, window=50, headroom=0.6, cooldown=2.0, log=None) -> None:
+        self.levels = levels
+        self.budget = budget
+        # seconds of work per frame over the last window frames
+        self.samples = deque(maxlen=window)
+        # quality is raised again once frames take less than headroom * budget
+        self.headroom = headroom
+        # seconds to wait after a change, so that its effect shows in the samples
+        self.cooldown = cooldown
+        self.changed_ts = time.perf_counter()
+        # number of lowered levels
+        self.level = 0
+        # optional file to append changes to, they are printed as well
+        self.log = log
+
+    def update(self, frame_time):
+        self.samples.append(frame_time)
+        now = time.perf_counter()
+        if len(self.samples) < self.samples.maxlen or now - self.changed_ts < self.cooldown:
+            return
+
+        mean = sum(self.samples) / len(self.samples)
+        if mean > self.budget and self.level < len(self.levels):
+            name, function = self.levels[self.level]
+            function(False)
+            self.level += 1
+            self.report(f"lowered {name}", mean)
+        elif mean < self.headroom * self.budget and self.level > 0:
+            self.level -= 1
+            name, function = self.levels[self.level]
+            function(True)
+            self.report(f"raised {name}", mean)
+        else:
+            return
+        self.samples.clear()
+        self.changed_ts = now
+
+    def report(self, change, mean):
+        message = (
+            f"Quality {change} (level {self.level}/{len(self.levels)}), "
+            f"{mean * 1000:.1f} ms per frame for a budget of {self.budget * 1000:.1f} ms"
+        )
+        print(message)
+        if self.log:
+            with open(self.log, "a") as file:
+                file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}\n")
@@ -1,27 +1,133 @@
-import cv2
 import os
-from datetime import datetime
+import threading
+import time
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from scripts.scanPipeline import EXTENSIONS, file_hash
 
 
 class ImageFileEventHandler(FileSystemEventHandler):
-    def __init__(self, scanner, outbound, remove=False, callback=None):
+    def __init__(self, pipeline, outbound, index, remove=False, callback=None, settle=1.0):
         super().__init__()
-        self.scanner = scanner
+        self.pipeline = pipeline
         self.remove = remove
         self.outbound = outbound
         self.callback = callback
 
+        # files are scanned once their size and mtime did not change for settle seconds
+        self.settle = settle
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+
+        # content hashes of imported files from the FishIndex, which the pipeline's scanners add to
+        self.hashes = index.hashes()
+
+        self.counters = {"seen": 0, "coalesced": 0, "scanned": 0, "rejected": 0}
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
     def on_created(self, event: FileSystemEvent) -> None:
+        self.queue(event)
+        return super().on_created(event)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        self.queue(event)
+        return super().on_modified(event)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        # e.g. temp file renamed after upload, only the destination counts
+        with self.lock:
+            self.pending.pop(event.src_path, None)
+        self.queue(event, event.dest_path)
+        return super().on_moved(event)
+
+    def queue(self, event, path=None):
+        path = path or event.src_path
+        if event.is_directory or not path.lower().endswith(EXTENSIONS):
+            return
+        with self.lock:
+            self.counters["seen"] += 1
+            if path in self.pending:
+                self.counters["coalesced"] += 1
+            # (size, mtime) of the last check and time of the last event
+            self.pending[path] = (None, time.time())
+
+    def run(self):
+        while not self.stopped.wait(self.settle / 2):
+            batch = []
+            for path in self.settled():
+                try:
+                    digest = file_hash(path)
+                except OSError:
+                    continue
+                if digest in self.hashes or digest in (item[1] for item in batch):
+                    print(f"Skipped {path}, it has been imported before")
+                    self.counters["rejected"] += 1
+                    if self.remove:
+                        try:
+                            os.remove(path)
+                        except OSError as error:
+                            print(error)
+                else:
+                    batch.append((path, digest))
+
+            # hand the batch to the scan pipeline, waiting while it is busy, but not after stop
+            for path, digest in batch:
+                self.hashes.add(digest)
+                while not self.stopped.is_set():
+                    if self.pipeline.submit(
+                        path,
+                        lambda file, filename, digest=digest: self.on_scanned(file, filename, digest),
+                        source_hash=digest,
+                        timeout=self.settle / 2,
+                    ):
+                        break
+                if self.stopped.is_set():
+                    return
+
+    def settled(self):
+        # pending files that stopped changing
+        now = time.time()
+        ready = []
+        with self.lock:
+            for path, (last, changed) in list(self.pending.items()):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # removed or renamed
+                    del self.pending[path]
+                    continue
+                current = (stat.st_size, stat.st_mtime_ns)
+                if current == last and now - changed >= self.settle:
+                    del self.pending[path]
+                    ready.append(path)
+                elif current != last:
+                    self.pending[path] = (current, now)
+        return ready
+
+    def on_scanned(self, file, filename, digest):
+        # runs on the main loop
         try:
-            filename = self.scanner.scan(event.src_path)
             if filename is not None:
+                self.counters["scanned"] += 1
                 if self.remove:
-                    os.remove(event.src_path)
+                    os.remove(file)
                 if self.callback:
                     self.callback(filename)
             else:
-                print(f"Failed to scan {event.src_path}")
+                # allow the same file to be scanned again
+                self.hashes.discard(digest)
+                self.counters["rejected"] += 1
+                print(f"Failed to scan {file}")
         except Exception as error:
             print(error)
-        return super().on_created(event)
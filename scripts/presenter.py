@@ -0,0 +1,74 @@
+import pygame
+from pygame._sdl2.video import Renderer, Texture, Window
+
+
+class SurfacePresenter:
+    # scales the display surface to the screen in software
+
+    def __init__(self, display_size, size=None, smooth=True, display=0, title="Fish Tank") -> None:
+        self.display_size = display_size
+        self.smooth = smooth
+        pygame.display.set_caption(title)
+        if size is None:
+            size = pygame.display.get_desktop_sizes()[display]
+        self.screen = pygame.display.set_mode(size, pygame.RESIZABLE, display=display)
+        self.resize()
+
+    def resize(self):
+        self.scale, self.rect = fit(self.display_size, self.screen.get_size())
+        # target surface of the scaled display, reused every frame
+        self.scaled = None if self.scale == 1 else pygame.Surface(self.rect.size)
+        self.screen.fill((0, 0, 0, 0))
+
+    def set_smooth(self, smooth):
+        self.smooth = smooth
+
+    def present(self, display):
+        if self.scaled is None:
+            self.screen.blit(display, self.rect)
+        else:
+            scale = pygame.transform.smoothscale if self.smooth else pygame.transform.scale
+            scale(display, self.rect.size, self.scaled)
+            self.screen.blit(self.scaled, self.rect)
+        pygame.display.flip()
+
+
+class RendererPresenter:
+    # uploads the display surface to a texture and lets SDL's renderer scale it
+
+    def __init__(self, display_size, size=None, smooth=True, display=0, title="Fish Tank") -> None:
+        self.display_size = display_size
+        self.smooth = smooth
+        if size is None:
+            size = pygame.display.get_desktop_sizes()[display]
+        # the window does not set a format for images to convert to, a hidden display mode does
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        # centered on the given display (SDL_WINDOWPOS_CENTERED_DISPLAY)
+        position = (0x2FFF0000 | display, 0x2FFF0000 | display)
+        self.window = Window(title, size, position=position, resizable=True)
+        self.renderer = Renderer(self.window)
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.texture = Texture(self.renderer, display_size, streaming=True, scale_quality=int(smooth))
+        self.resize()
+
+    def resize(self):
+        self.scale, self.rect = fit(self.display_size, self.window.size)
+
+    def set_smooth(self, smooth):
+        # the scale quality is a property of the texture
+        self.smooth = smooth
+        self.texture = Texture(self.renderer, self.display_size, streaming=True, scale_quality=int(smooth))
+
+    def present(self, display):
+        self.texture.update(display)
+        self.renderer.clear()
+        self.texture.draw(dstrect=self.rect)
+        self.renderer.present()
+
+
+def fit(display_size, screen_size):
+    # largest scale of display that fits on screen, and the centered rect on screen
+    scale = min(screen_size[0] / display_size[0], screen_size[1] / display_size[1])
+    width, height = int(display_size[0] * scale), int(display_size[1] * scale)
+    rect = pygame.Rect((screen_size[0] - width) // 2, (screen_size[1] - height) // 2, width, height)
+    return scale, rect
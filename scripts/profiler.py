@@ -0,0 +1,96 @@
+import json
+import time
+from collections import deque
+import numpy as np
+import pygame
+
+
+class Profiler:
+    def __init__(self, window=250, log=None, refresh=10) -> None:
+        self.enabled = False
+        # seconds per stage of the current frame, shared with Flock.timings while enabled
+        self.frame = {}
+        # rolling milliseconds per stage over the last window frames
+        self.samples = {}
+        self.window = window
+        self.frame_ts = None
+
+        # optional file to append one json record per frame to
+        self.log = log
+        self.log_file = None
+
+        # the overlay is redrawn every refresh frames
+        self.refresh = refresh
+        self.frames = 0
+        self.overlay = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frame.clear()
+        self.samples = {}
+        self.frame_ts = None
+        self.overlay = None
+        if self.enabled and self.log:
+            self.log_file = open(self.log, "a")
+        elif self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def measure(self, name, function, *args):
+        # call function, adding its duration to the current frame when enabled
+        if not self.enabled:
+            return function(*args)
+        start = time.perf_counter()
+        result = function(*args)
+        self.frame[name] = self.frame.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+    def end_frame(self, **values):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_ts is not None:
+            self.frame["frame"] = now - self.frame_ts
+        self.frame_ts = now
+
+        for name, seconds in self.frame.items():
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(seconds * 1000)
+
+        if self.log_file:
+            record = {name: round(seconds * 1000, 3) for name, seconds in self.frame.items()}
+            self.log_file.write(json.dumps({"ts": time.time(), **record, **values}) + "\n")
+        self.frame.clear()
+
+    def stats(self):
+        # p50, p95 and max in milliseconds per stage
+        return {
+            name: (np.percentile(samples, 50), np.percentile(samples, 95), max(samples))
+            for name, samples in self.samples.items()
+        }
+
+    def render(self, surface, font, lines=()):
+        if not self.enabled:
+            return
+        if self.overlay is None or self.frames % self.refresh == 0:
+            # a table of stages sorted by p95, and extra lines below
+            rows = [("ms", "p50", "p95", "max")]
+            for name, values in sorted(self.stats().items(), key=lambda item: -item[1][1]):
+                rows.append((name, *(f"{value:.2f}" for value in values)))
+            rows += [(line,) for line in lines]
+
+            height = font.get_linesize()
+            width = max(font.size(row[0])[0] for row in rows[: len(rows) - len(lines)]) + 20
+            column = font.size("0000.00")[0] + 10
+            self.overlay = pygame.Surface(
+                (max([width + 3 * column] + [font.size(line)[0] for line in lines]) + 20, len(rows) * height + 20)
+            )
+            self.overlay.set_alpha(200)
+            for i, row in enumerate(rows):
+                self.overlay.blit(font.render(row[0], True, "white"), (10, 10 + i * height))
+                for j, value in enumerate(row[1:]):
+                    text = font.render(value, True, "white")
+                    self.overlay.blit(text, (10 + width + (j + 1) * column - text.get_width(), 10 + i * height))
+        self.frames += 1
+        surface.blit(self.overlay, (0, 0))
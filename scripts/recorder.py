@@ -0,0 +1,109 @@
+import struct
+import numpy as np
+from scripts.flock import Flock
+
+# log format: a header with the flock settings, then one event per input in the order it reached the flock
+MAGIC = b"FISHLOG1"
+HEADER = struct.Struct("<8sQIB4i")
+TICK = struct.Struct("<Bdbb")
+EVENT = struct.Struct("<B")
+LIMIT = struct.Struct("<BI")
+TICK_EVENT, FEED_EVENT, ADD_EVENT, LIMIT_EVENT = 0, 1, 2, 3
+NEIGHBORS = ("dense", "grid")
+
+
+class Recorder:
+    # writes the seed and every input of a flock to a binary log, see Replay
+
+    def __init__(self, path, flock) -> None:
+        self.file = open(path, "wb")
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                flock.seed,
+                flock.max_boids,
+                NEIGHBORS.index(flock.neighbor_search),
+                *flock.min_position.astype(int),
+                *flock.max_position.astype(int),
+            )
+        )
+        self.ticks = 0
+        flock.recorder = self
+
+    def tick(self, timestep, predator_movement):
+        self.file.write(TICK.pack(TICK_EVENT, timestep, *predator_movement))
+        self.ticks += 1
+
+    def feed(self):
+        self.file.write(EVENT.pack(FEED_EVENT))
+
+    def add(self):
+        self.file.write(EVENT.pack(ADD_EVENT))
+
+    def limit(self, limit):
+        self.file.write(LIMIT.pack(LIMIT_EVENT, limit))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class Replay:
+    # drives a headless flock from a log written by Recorder
+
+    def __init__(self, path) -> None:
+        with open(path, "rb") as file:
+            self.data = file.read()
+        magic, self.seed, self.max_boids, neighbors, *area = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"Not a flock log: {path}")
+        self.neighbors = NEIGHBORS[neighbors]
+        self.area = tuple(area)
+        self.ticks = sum(1 for event in self.events() if event[0] == TICK_EVENT)
+
+    def flock(self, neighbors=None):
+        # a flock in the recorded initial state, optionally with another neighbor search
+        return Flock(
+            max=self.max_boids,
+            area=self.area,
+            neighbors=neighbors or self.neighbors,
+            headless=True,
+            seed=self.seed,
+        )
+
+    def events(self):
+        offset = HEADER.size
+        while offset < len(self.data):
+            event = self.data[offset]
+            if event == TICK_EVENT:
+                _, timestep, x, y = TICK.unpack_from(self.data, offset)
+                yield event, timestep, (x, y)
+                offset += TICK.size
+            elif event in (FEED_EVENT, ADD_EVENT):
+                yield (event,)
+                offset += EVENT.size
+            elif event == LIMIT_EVENT:
+                yield LIMIT.unpack_from(self.data, offset)
+                offset += LIMIT.size
+            else:
+                raise ValueError(f"Unknown event {event} at offset {offset}")
+
+    def run(self, flock, every=0):
+        # replay all events into flock, returning the positions of all slots every nth tick (NaN for free slots)
+        trajectory = []
+        ticks = 0
+        for event in self.events():
+            if event[0] == TICK_EVENT:
+                flock.update(event[1], event[2])
+                ticks += 1
+                if every and ticks % every == 0:
+                    positions = np.full((flock.max_boids, 2), np.nan)
+                    positions[: flock.count] = flock.positions
+                    trajectory.append(positions)
+            elif event[0] == FEED_EVENT:
+                flock.feed()
+            elif event[0] == LIMIT_EVENT:
+                flock.set_limit(event[1])
+            else:
+                flock.add(None)
+        return np.array(trajectory).reshape(-1, flock.max_boids, 2)
@@ -0,0 +1,130 @@
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+import cv2
+import numpy as np
+from scripts.scanner import Scanner
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# scanner of a worker process, created once by init_worker
+scanner = None
+
+
+def file_hash(file):
+    with open(file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def init_worker(outbound, index=None):
+    global scanner
+    scanner = Scanner(outbound, index=index)
+
+
+def scan(file, source_hash=None):
+    return scanner.scan(file, source_hash)
+
+
+def scan_upload(data, source_hash=None):
+    # (file, template id) of uploaded image bytes, or (None, reason) if they could not be scanned
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None, "not an image"
+    image, template_id = scanner.extract(image)
+    if image is None:
+        return None, "markers not found"
+    return scanner.save(image, template_id, source_hash), int(template_id)
+
+
+def save(image, template_id):
+    return scanner.save(image, template_id)
+
+
+class ScanPipeline:
+    def __init__(self, outbound, workers=None, pending=None, index=None) -> None:
+        # scans are recorded in the FishIndex at path index, if given
+        # leave one cpu for the aquarium itself
+        workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(outbound, index),
+        )
+        # limits the number of scans waiting for a worker
+        self.slots = threading.BoundedSemaphore(pending or 2 * workers)
+        # finished scans, drained by the main loop
+        self.results = queue.Queue()
+        # scans in flight are dropped on close, saves of fishes already in the tank are finished
+        self.scans = set()
+        self.saves = set()
+
+    def submit(self, file, callback=None, block=True, source_hash=None, timeout=None):
+        # wait for a free slot (back-pressure), or return False if block is False or timeout seconds passed
+        # while all slots are taken
+        if not self.slots.acquire(block, timeout if block and timeout is not None else -1):
+            return False
+        try:
+            future = self.executor.submit(scan, file, source_hash)
+        except RuntimeError:
+            # executor has been shut down
+            self.slots.release()
+            return False
+        self.scans.add(future)
+        future.add_done_callback(lambda future: self.done(file, future, callback))
+        return True
+
+    def submit_upload(self, data, source_hash=None):
+        # future of scanning image bytes in a worker (see scan_upload), without back-pressure
+        future = self.executor.submit(scan_upload, data, source_hash)
+        self.scans.add(future)
+        future.add_done_callback(self.scans.discard)
+        return future
+
+    def save(self, image, template_id):
+        # write a scanned image to outbound in a worker process
+        future = self.executor.submit(save, image, template_id)
+        self.saves.add(future)
+        future.add_done_callback(self.saved)
+
+    def saved(self, future):
+        self.saves.discard(future)
+        if not future.cancelled() and future.exception():
+            print(future.exception())
+
+    def post(self, file, result, callback):
+        # hand a result from another thread to the main loop
+        self.results.put((file, result, callback))
+
+    def done(self, file, future, callback):
+        self.scans.discard(future)
+        self.slots.release()
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as error:
+            print(error)
+            result = None
+        self.post(file, result, callback)
+
+    def process(self):
+        # run callbacks of finished scans, called from the main loop
+        while True:
+            try:
+                file, result, callback = self.results.get_nowait()
+            except queue.Empty:
+                return
+            if callback:
+                callback(file, result)
+
+    def close(self):
+        # cancel waiting scans, so that the saves queued behind them run next, and wait for the saves
+        for future in list(self.scans):
+            future.cancel()
+        wait(list(self.saves))
+        self.executor.shutdown(wait=False, cancel_futures=True)
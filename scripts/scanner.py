@@ -1,15 +1,31 @@
 from datetime import datetime
+import json
 import os
 import cv2
-from cv2.typing import MatLike
-import imutils
 import numpy as np
+from scripts.fishIndex import FishIndex, encode_thumbnail
 
 
 class Scanner:
 
-    def __init__(self, outbound) -> None:
+    def __init__(
+        self,
+        outbound,
+        mask_bank=os.path.join("data", "cache", "masks.npy"),
+        detect_width=600,
+        warp_width=1200,
+        interpolation=cv2.INTER_LINEAR,
+        index=None,
+    ) -> None:
         self.outbound = outbound
+        # optional path of a FishIndex to record saved fishes in
+        self.index = FishIndex(index) if index else None
+        self.mask_bank = mask_bank
+        # photos are halved down to at least warp_width (None = full resolution) to refine markers and warp from,
+        # and further down to at least detect_width to detect markers. detect_width >= warp_width skips refining.
+        self.detect_width = detect_width
+        self.warp_width = warp_width
+        self.interpolation = interpolation
         self.size = [600, 848]
         self.corners = np.float32([(0, 0), (self.size[0], 0), (self.size[0], self.size[1]), (0, self.size[1])])
         self.masks = self.load_masks()
@@ -18,12 +34,29 @@ class Scanner:
         )
 
     def load_masks(self):
-        masks = []
+        # warped masks are precompiled into one array file, which is memory mapped read-only,
+        # so scanners in several processes share the same pages
         path = os.path.join("./data/images/fishes/mask")
         files = sorted([f for f in os.listdir(path) if os.path.isfile(os.path.join(path, f)) and f.endswith(".png")])
-        for file in files:
-            masks.append(self.load_mask(path, file))
-        return masks
+        key = {"size": self.size, "files": [[f, os.stat(os.path.join(path, f)).st_mtime_ns] for f in files]}
+        try:
+            with open(f"{self.mask_bank}.json") as file:
+                if json.load(file) == key:
+                    return np.load(self.mask_bank, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+        return self.build_masks(path, files, key)
+
+    def build_masks(self, path, files, key):
+        masks = np.stack([self.load_mask(path, file) for file in files])
+        # write to process specific temp files, since several workers may rebuild at the same time
+        temp = f"{self.mask_bank}.{os.getpid()}.npy"
+        np.save(temp, masks)
+        os.replace(temp, self.mask_bank)
+        with open(f"{self.mask_bank}.{os.getpid()}.json", "w") as file:
+            json.dump(key, file)
+        os.replace(f"{self.mask_bank}.{os.getpid()}.json", f"{self.mask_bank}.json")
+        return np.load(self.mask_bank, mmap_mode="r")
 
     def load_mask(self, path, file):
         # load mask as is (with transparent background)
@@ -36,60 +69,104 @@ class Scanner:
         mask = cv2.warpPerspective(mask, matrix, self.size)
         return mask
 
-    def scan(self, file) -> tuple[MatLike | None, int | None]:
-        # read and resize image
+    def scan(self, file, source_hash=None) -> str | None:
+        # read image
         image = cv2.imread(os.path.join(file))
-        image = imutils.resize(image, width=self.size[0])
+        if image is None:
+            return None
+        return self.scan_image(image, source_hash=source_hash)
 
-        # detect aruco markers
-        (markers, ids, rejected) = self.aruco_detector.detectMarkers(image)
+    def scan_image(self, image, markers=None, source_hash=None) -> str | None:
+        image, template_id = self.extract(image, markers)
+        if image is None:
+            return None
+        return self.save(image, template_id, source_hash)
 
-        translate_src = []
-        translate_dst = []
-        template_id = None
+    def extract(self, image, markers=None):
+        # aligned BGRA cutout and template id, or (None, None).
+        # markers by id can be passed if they have already been detected in image.
+        if markers is None:
+            fine, corners, template_id = self.locate(image)
+        else:
+            fine = self.downscale(image, self.warp_width)
+            scale = fine.shape[1] / image.shape[1]
+            corners = {id: marker * scale for id, marker in markers.items() if id < 4}
+            template_id = next((id - 4 for id in markers if id >= 4), None)
+        if len(corners) < 4 or template_id is None or template_id >= len(self.masks):
+            return None, None
+        aligned = self.align(fine, corners)
+        return self.cutout(aligned, template_id), template_id
+
+    def locate(self, image):
+        # image pyramid: the level we warp from and a smaller one to detect markers on
+        fine = self.downscale(image, self.warp_width)
+        coarse = self.downscale(fine, self.detect_width)
+        scale = fine.shape[1] / coarse.shape[1]
+
+        # images without all corner markers are rejected before looking at the larger level
+        markers, template_id = self.detect(coarse)
+        if len(markers) < 4:
+            return fine, markers, template_id
 
+        # refine the corner markers on the larger level, searching only around their coarse position
+        markers = {id: corners * scale for id, corners in markers.items()}
+        if scale != 1:
+            markers = self.refine(fine, markers)
+        return fine, markers, template_id
+
+    def downscale(self, image, width):
+        # halve image while it stays at least width wide
+        if width is not None:
+            while image.shape[1] // 2 >= width:
+                image = cv2.pyrDown(image)
+        return image
+
+    def detect(self, image):
+        # corners of markers 0-3 (in top-left, top-right, bottom-right, and bottom-left order) and the template id
+        markers, ids, rejected = self.aruco_detector.detectMarkers(image)
+        corners = {}
+        template_id = None
+        if ids is None:
+            return corners, template_id
         for marker, id in zip(markers, ids.flatten()):
-            # extract the marker corners (which are returned in top-left, top-right, bottom-right, and bottom-left order)
-            corners = marker.reshape((4, 2))
-            (topLeft, topRight, bottomRight, bottomLeft) = corners
-
-            # extract translation points
-            match id:
-                case 0:
-                    translate_src.append((int(topLeft[0]), int(topLeft[1])))
-                    translate_dst.append(self.corners[0])
-                case 1:
-                    translate_src.append((int(topRight[0]), int(topRight[1])))
-                    translate_dst.append(self.corners[1])
-                case 2:
-                    translate_src.append((int(bottomRight[0]), int(bottomRight[1])))
-                    translate_dst.append(self.corners[2])
-                case 3:
-                    translate_src.append((int(bottomLeft[0]), int(bottomLeft[1])))
-                    translate_dst.append(self.corners[3])
-                case _:
-                    template_id = id - 4
-
-        if len(translate_src) == 4:
-            # align image
-            matrix = cv2.getPerspectiveTransform(np.float32(translate_src), np.float32(translate_dst))
-            aligned = cv2.warpPerspective(image, matrix, self.size, flags=cv2.INTER_LINEAR)
-
-            # if we recognized a template id and have a mask for it
-            if template_id is not None and template_id < len(self.masks):
-                # cutout a silhouette
-                mask = self.masks[template_id]
-                aligned = cv2.bitwise_and(aligned, aligned, mask=mask)
-
-                # set alpha channel for transparent background
-                alpha = np.sum(aligned, axis=-1) > 0
-                alpha = np.uint8(alpha * 255)
-                aligned = np.dstack((aligned, alpha))
-
-                # write file
-                date = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                file = os.path.join(self.outbound, f"{date}-{template_id}.png")
-                cv2.imwrite(file, aligned)
-                return file
-
-        return None
+            if id < 4:
+                corners[id] = marker.reshape((4, 2))
+            else:
+                template_id = id - 4
+        return corners, template_id
+
+    def refine(self, image, markers):
+        refined = {}
+        for id, corners in markers.items():
+            # search in a region of interest, extending the marker by half its size to each side
+            margin = np.ptp(corners, axis=0).max() / 2
+            x0, y0 = np.maximum(np.floor(corners.min(axis=0) - margin), 0).astype(int)
+            x1, y1 = np.ceil(corners.max(axis=0) + margin).astype(int)
+            roi_markers, _ = self.detect(image[y0:y1, x0:x1])
+            # keep the coarse corners if the marker is not found again
+            refined[id] = roi_markers[id] + (x0, y0) if id in roi_markers else corners
+        return refined
+
+    def align(self, image, markers):
+        # the outer corner of each marker is mapped to the corresponding corner of the scan
+        translate_src = np.float32([markers[id][id] for id in range(4)])
+        matrix = cv2.getPerspectiveTransform(translate_src, self.corners)
+        return cv2.warpPerspective(image, matrix, self.size, flags=self.interpolation)
+
+    def cutout(self, aligned, template_id):
+        # cutout a silhouette
+        mask = self.masks[template_id]
+        aligned = cv2.bitwise_and(aligned, aligned, mask=mask)
+
+        # set alpha channel for transparent background
+        alpha = np.sum(aligned, axis=-1) > 0
+        alpha = np.uint8(alpha * 255)
+        return np.dstack((aligned, alpha))
+
+    def save(self, image, template_id, source_hash=None):
+        date = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        file = os.path.join(self.outbound, f"{date}-{template_id}.png")
+        cv2.imwrite(file, image)
+        if self.index:
+            self.index.add(file, template_id, date, source_hash, encode_thumbnail(image))
+        return file
@@ -0,0 +1,127 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# control block in front of the states:
+# index of the current state, capacity, food capacity, world width and height, and whether the simulation stopped
+CONTROL = np.dtype((np.int64, 6))
+
+
+def state_dtype(capacity, food_capacity):
+    # one flock state, the same bytes are shared in memory and sent as snapshots
+    return np.dtype(
+        [
+            # odd while SharedFlock writes the state
+            ("sequence", np.uint64),
+            ("tick", np.uint64),
+            ("count", np.uint32),
+            ("oldest", np.uint32),
+            ("food_count", np.uint32),
+            ("predator_frame", np.uint32),
+            ("predator_flip", np.uint32),
+            ("predator", np.float32, 2),
+            ("previous_predator", np.float32, 2),
+            ("ids", np.int64, capacity),
+            ("positions", np.float32, (capacity, 2)),
+            ("previous_positions", np.float32, (capacity, 2)),
+            ("velocities", np.float32, (capacity, 2)),
+            ("food", np.float32, (food_capacity, 2)),
+        ]
+    )
+
+
+def write_state(state, flock, tick):
+    # copy a flock, whose boids are fish ids, into a state array of length 1
+    count = flock.count
+    state["tick"] = tick
+    state["count"] = count
+    state["oldest"] = flock.oldest
+    state["ids"][0, :count] = [-1 if id is None else id for id in flock.boids[:count]]
+    state["positions"][0, :count] = flock.positions
+    state["previous_positions"][0, :count] = flock.previous_position_slots[:count]
+    state["velocities"][0, :count] = flock.velocities
+    food = flock.food[: state["food"].shape[1]]
+    state["food_count"] = len(food)
+    state["food"][0, : len(food)] = food
+    state["predator"] = flock.predator
+    state["previous_predator"] = flock.previous_predator
+    state["predator_frame"] = flock.predator_frame
+    state["predator_flip"] = flock.predator_flip
+
+
+def read_state(flock, state):
+    # point the arrays of a flock that only renders at a state array of length 1, without copying
+    count = int(state["count"][0])
+    flock.count = count
+    flock.oldest = int(state["oldest"][0])
+    flock.position_slots = state["positions"][0]
+    flock.previous_position_slots = state["previous_positions"][0]
+    flock.velocity_slots = state["velocities"][0]
+    flock.positions = flock.position_slots[:count]
+    flock.velocities = flock.velocity_slots[:count]
+    flock.food = state["food"][0, : int(state["food_count"][0])]
+    flock.predator = state["predator"][0]
+    flock.previous_predator = state["previous_predator"][0]
+    flock.predator_frame = int(state["predator_frame"][0])
+    flock.predator_flip = bool(state["predator_flip"][0])
+
+
+class SharedFlock:
+    # two flock states in shared memory, written alternately by the simulation process.
+    # readers copy the current state and render the copy. the state is written again two ticks later, a reader that
+    # copies it meanwhile (e.g. a slow screen) sees its sequence change and copies again.
+
+    def __init__(self, name=None, capacity=None, food_capacity=64, world=None) -> None:
+        if capacity is None:
+            # attach to the states of a simulation process. renderer processes are started by the simulation's
+            # process and share its resource tracker, which removes the memory only if the simulation did not.
+            self.memory = shared_memory.SharedMemory(name)
+            self.owner = False
+            control = np.ndarray((), CONTROL, self.memory.buf)
+            capacity, food_capacity, width, height = (int(value) for value in control[1:5])
+        else:
+            width, height = world
+            size = CONTROL.itemsize + 2 * state_dtype(capacity, food_capacity).itemsize
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+            self.owner = True
+        self.name = self.memory.name
+        self.capacity = capacity
+        self.food_capacity = food_capacity
+        self.world = (width, height)
+        self.dtype = state_dtype(capacity, food_capacity)
+        self.control = np.ndarray((), CONTROL, self.memory.buf)
+        self.states = np.ndarray((2,), self.dtype, self.memory.buf, CONTROL.itemsize)
+        if self.owner:
+            self.control[:] = (0, capacity, food_capacity, width, height, 0)
+
+    def write(self, flock, tick):
+        # write the state that is not current, then make it current
+        index = 1 - int(self.control[0])
+        state = self.states[index : index + 1]
+        state["sequence"] += 1
+        write_state(state, flock, tick)
+        state["sequence"] += 1
+        self.control[0] = index
+
+    def latest(self):
+        # copy of the current state as an array of length 1, taken again if the state was written meanwhile
+        while True:
+            index = int(self.control[0])
+            state = self.states[index : index + 1]
+            sequence = int(state["sequence"][0])
+            copy = state.copy()
+            if sequence % 2 == 0 and int(state["sequence"][0]) == sequence:
+                return copy
+
+    @property
+    def closed(self):
+        return bool(self.control[5])
+
+    def close(self):
+        if self.owner:
+            # tell the renderers, which keep their mapping after the memory is removed
+            self.control[5] = 1
+        self.control = None
+        self.states = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,143 @@
+import socket
+import struct
+import threading
+import numpy as np
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+from scripts.sharedFlock import state_dtype
+
+# fixed records instead of pickles, which would run code of anyone who can connect:
+# hello of the publisher with capacity, food capacity, world width and height
+HELLO = struct.Struct("<IIII")
+# input of a renderer with kind, screen and movement x, y
+INPUT = struct.Struct("<BBbb")
+KINDS = ("feed", "move", "quit")
+
+
+def parse_address(address):
+    # "host:port" to a (host, port) tuple
+    host, port = address.rsplit(":", 1)
+    return (host, int(port))
+
+
+def encode_input(message):
+    # ("feed",), ("move", screen, x, y) or ("quit",) to an INPUT record
+    kind, screen, x, y = (*message, 0, 0, 0)[:4]
+    return INPUT.pack(KINDS.index(kind), screen, x, y)
+
+
+def decode_input(data):
+    # INPUT record to a message, raises ValueError for anything else
+    try:
+        kind, screen, x, y = INPUT.unpack(data)
+        kind = KINDS[kind]
+    except (struct.error, IndexError):
+        raise ValueError("not an input record")
+    if kind == "move":
+        return (kind, screen, max(-1, min(x, 1)), max(-1, min(y, 1)))
+    return (kind,)
+
+
+class SnapshotPublisher:
+    # sends the flock state of every tick to renderers on other machines, and passes their input to the simulation.
+    # a client that is too slow skips ticks instead of holding up the simulation.
+
+    def __init__(self, address, authkey, shared, inputs) -> None:
+        if not authkey:
+            raise ValueError("an authkey is required to publish the tank")
+        self.authkey = authkey
+        self.shared = shared
+        # queue of input messages of all renderers
+        self.inputs = inputs
+        # clients authenticate in their own thread, so one that does not answer holds up no other
+        self.listener = Listener(parse_address(address))
+        self.lock = threading.Lock()
+        self.clients = []
+        self.snapshot = None
+        self.stopped = False
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while not self.stopped:
+            try:
+                connection = self.listener.accept()
+            except Exception:
+                # closed, or a connection failed before it was accepted
+                continue
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        client = {"connection": connection, "event": threading.Event(), "snapshot": None}
+        try:
+            deliver_challenge(connection, self.authkey)
+            answer_challenge(connection, self.authkey)
+            width, height = self.shared.world
+            connection.send_bytes(HELLO.pack(self.shared.capacity, self.shared.food_capacity, width, height))
+            with self.lock:
+                self.clients.append(client)
+            while not self.stopped:
+                if client["event"].wait(0.1):
+                    client["event"].clear()
+                    connection.send_bytes(client["snapshot"])
+                while connection.poll():
+                    self.inputs.put(decode_input(connection.recv_bytes(INPUT.size)))
+        except Exception:
+            # failed to authenticate, sent something else than input, or disconnected
+            pass
+        finally:
+            with self.lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            connection.close()
+
+    def publish(self, state):
+        # state array of length 1, copied once for all clients
+        snapshot = state.tobytes()
+        with self.lock:
+            for client in self.clients:
+                client["snapshot"] = snapshot
+                client["event"].set()
+
+    def close(self):
+        self.stopped = True
+        self.listener.close()
+
+
+class SnapshotSubscriber:
+    # receives the flock states of a SnapshotPublisher in a thread, has the interface of SharedFlock for renderers
+
+    def __init__(self, address, authkey) -> None:
+        self.connection = Client(parse_address(address), authkey=authkey)
+        self.capacity, self.food_capacity, width, height = HELLO.unpack(self.connection.recv_bytes(HELLO.size))
+        self.world = (width, height)
+        self.dtype = state_dtype(self.capacity, self.food_capacity)
+        self.state = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.receive, daemon=True)
+        self.thread.start()
+
+    def receive(self):
+        try:
+            while True:
+                # a read only view of the received bytes
+                self.state = np.frombuffer(self.connection.recv_bytes(), self.dtype)
+        except (EOFError, OSError):
+            self.closed = True
+
+    def latest(self):
+        return self.state
+
+    def send(self, message):
+        self.connection.send_bytes(encode_input(message))
+
+    def close(self):
+        self.closed = True
+        # end the receive thread's blocked read with EOF, before the connection releases its handle
+        with socket.fromfd(self.connection.fileno(), socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                # already disconnected
+                pass
+        self.thread.join()
+        self.connection.close()
@@ -0,0 +1,120 @@
+import os
+import time
+import pygame
+
+from scripts import aquarium
+from scripts.fishIndex import FishIndex
+from scripts.flock import Flock
+from scripts.presenter import RendererPresenter, SurfacePresenter
+from scripts.sharedFlock import read_state
+from scripts.videoCache import VideoCache
+from scripts.videoDecoder import VideoDecoder
+
+
+class TankScreen:
+    # renders one screen of a tank simulated by TankSimulation in another process or on another machine.
+    # source is a SharedFlock or SnapshotSubscriber, send(message) passes input to the simulation.
+
+    def __init__(self, source, screen, send, display=0, screen_size=(1280, 720)) -> None:
+        pygame.init()
+        self.source = source
+        self.screen = screen
+        self.send = send
+        self.display = pygame.Surface(screen_size)
+        presenter = RendererPresenter if aquarium.PRESENTER == "renderer" else SurfacePresenter
+        self.presenter = presenter(screen_size, display=display, title=f"Fish Tank {screen + 1}")
+        pygame.mouse.set_visible(False)
+        self.clock = pygame.Clock()
+        self.timestep = 1 / aquarium.SIMULATION_RATE
+
+        # viewport of this screen in the world
+        self.offset = (screen * screen_size[0], 0)
+
+        video = VideoCache if aquarium.VIDEO_CACHE else VideoDecoder
+        self.video = video(os.path.join("data/video/underwater.mp4"), screen_size)
+
+        # a flock that only renders, its arrays view copies of the states of the simulation.
+        # fish sprites are loaded from the index when a slot gets another fish id.
+        self.flock = Flock(
+            max=source.capacity,
+            area=(0, 0, *source.world),
+            neighbors="grid",
+            rotation_steps=aquarium.ROTATION_STEPS,
+        )
+        self.fishes = FishIndex(aquarium.FISH_INDEX)
+        self.ids = [None] * source.capacity
+        self.tick = None
+        self.tick_ts = time.perf_counter()
+        self.movement = [False, False, False, False]
+
+    def run(self):
+        self.video.start()
+        try:
+            running = True
+            while running and not self.source.closed:
+                self.sync()
+                self.render()
+
+                movement = list(self.movement)
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+                        self.presenter.resize()
+                    if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+                        pressed = event.type == pygame.KEYDOWN
+                        if event.key in (pygame.K_LEFT, pygame.K_a):
+                            self.movement[0] = pressed
+                        if event.key in (pygame.K_RIGHT, pygame.K_d):
+                            self.movement[1] = pressed
+                        if event.key in (pygame.K_UP, pygame.K_w):
+                            self.movement[2] = pressed
+                        if event.key in (pygame.K_DOWN, pygame.K_s):
+                            self.movement[3] = pressed
+                        if pressed and event.key == pygame.K_f:
+                            self.send(("feed",))
+                        if pressed and event.key == pygame.K_ESCAPE:
+                            # stop the whole tank
+                            self.send(("quit",))
+                            running = False
+                if movement != self.movement:
+                    self.send(
+                        ("move", self.screen, self.movement[1] - self.movement[0], self.movement[3] - self.movement[2])
+                    )
+
+                self.clock.tick(aquarium.FPS)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.video.stop()
+        self.fishes.close()
+        self.source.close()
+        pygame.quit()
+
+    def sync(self):
+        # copy the latest state, and load the sprites of new fishes
+        state = self.source.latest()
+        if state is None:
+            return
+        tick = int(state["tick"][0])
+        if tick != self.tick:
+            # interpolation starts from the previous positions of the state
+            self.tick = tick
+            self.tick_ts = time.perf_counter()
+        read_state(self.flock, state)
+        for slot, id in enumerate(state["ids"][0, : self.flock.count].tolist()):
+            if id != self.ids[slot]:
+                self.ids[slot] = id
+                # fishes missing in the index of this machine show as pellets
+                thumbnail = self.fishes.thumbnail_by_id(id)
+                self.flock.boids[slot] = aquarium.load_thumbnail(thumbnail) if thumbnail else self.flock.food_surface
+                self.flock.sprites[slot] = [None] * (2 * self.flock.rotation_steps)
+
+    def render(self):
+        self.display.fill((0, 0, 0, 0))
+        self.display.blit(self.video.get_frame(), (0, 0))
+        if self.tick is not None:
+            alpha = min((time.perf_counter() - self.tick_ts) / self.timestep, 1.0)
+            self.flock.render(self.display, alpha, self.offset)
+        self.presenter.present(self.display)
@@ -0,0 +1,121 @@
+import os
+import queue
+import time
+import numpy as np
+
+from scripts.fishIndex import FishIndex
+from scripts.flock import Flock
+from scripts.sharedFlock import SharedFlock
+from scripts.snapshotTransport import SnapshotPublisher
+
+
+class TankSimulation:
+    # steps one flock across the world of several screens, and shares its state with their renderers (see TankScreen).
+    # boids are fish ids of the index, renderers load their thumbnails.
+
+    def __init__(
+        self,
+        screens,
+        screen_size=(1280, 720),
+        boids_per_screen=25,
+        index=None,
+        outbound=os.path.join("data", "outbound"),
+        inputs=None,
+        name=None,
+        publish=None,
+        authkey=None,
+        rate=25,
+        neighbors="grid",
+        seed=None,
+    ) -> None:
+        # the world is a row of screens, fish count and food scale with it
+        self.screens = screens
+        width, height = screens * screen_size[0], screen_size[1]
+        self.flock = Flock(
+            max=boids_per_screen * screens,
+            area=(100, 100, width - 100, height - 100),
+            neighbors=neighbors,
+            headless=True,
+            seed=seed,
+        )
+        self.shared = SharedFlock(name, self.flock.max_boids, 64 * screens, (width, height))
+        self.timestep = 1 / rate
+        self.tick = 0
+
+        # input messages of the renderers: ("feed",), ("move", screen, x, y) or ("quit",)
+        self.inputs = inputs if inputs is not None else queue.Queue()
+        self.movements = {}
+        self.publisher = SnapshotPublisher(publish, authkey, self.shared, self.inputs) if publish else None
+
+        # fishes added to the index by scanners are picked up every poll_interval seconds
+        self.fishes = FishIndex(index) if index else FishIndex()
+        if not self.fishes.count():
+            # first start with the index, add the fishes scanned before
+            self.fishes.import_files(outbound)
+        self.poll_interval = 2.0
+        self.last_id = 0
+        self.add_fishes(self.flock.max_boids)
+        self.running = False
+
+    def add_fishes(self, count):
+        ids = self.fishes.latest_ids(count, after=self.last_id)
+        for id in ids:
+            # create missing thumbnails here once, instead of in every renderer
+            self.fishes.thumbnail_by_id(id)
+            self.flock.add(id)
+        if ids:
+            self.last_id = max(self.last_id, max(ids))
+
+    def process_inputs(self):
+        while True:
+            try:
+                message = self.inputs.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "feed":
+                # one pellet per screen, somewhere in the world
+                for _ in range(self.screens):
+                    self.flock.feed()
+            elif message[0] == "move":
+                self.movements[message[1]] = message[2:]
+            elif message[0] == "quit":
+                self.running = False
+
+    def movement(self):
+        # submarine movement of all screens together
+        movement = np.sum(list(self.movements.values()) or [(0, 0)], axis=0)
+        return tuple(np.clip(movement, -1, 1))
+
+    def step(self):
+        self.process_inputs()
+        self.flock.update(self.timestep, self.movement())
+        self.tick += 1
+        self.shared.write(self.flock, self.tick)
+        if self.publisher:
+            self.publisher.publish(self.shared.latest())
+
+    def run(self, alive=None):
+        # step at the simulation rate until a renderer quits, or alive() returns False
+        self.running = True
+        next_ts = time.perf_counter()
+        poll_ts = next_ts
+        try:
+            while self.running and (alive is None or alive()):
+                self.step()
+                now = time.perf_counter()
+                if now - poll_ts > self.poll_interval:
+                    self.add_fishes(self.flock.max_boids)
+                    poll_ts = now
+                next_ts += self.timestep
+                if next_ts < now - 5 * self.timestep:
+                    # too far behind, drop the time instead of spiraling
+                    next_ts = now
+                time.sleep(max(0.0, next_ts - time.perf_counter()))
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.publisher:
+            self.publisher.close()
+        self.shared.close()
+        self.fishes.close()
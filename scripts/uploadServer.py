@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+# page for phones: pick or take a photo, which is posted as is
+FORM = b"""<!DOCTYPE html>
+<html><head><meta name="viewport" content="width=device-width"><title>Fish Tank</title></head>
+<body><h1>Fish Tank</h1>
+<input type="file" accept="image/*" id="photo"><p id="result"></p>
+<script>
+document.getElementById("photo").onchange = async (event) => {
+  const result = document.getElementById("result");
+  result.textContent = "Scanning...";
+  const response = await fetch("/upload", {method: "POST", body: event.target.files[0]});
+  const body = await response.json();
+  result.textContent = response.ok ? "Your fish is in the tank!" : "Sorry, " + body.error;
+};
+</script></body></html>
+"""
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    409: "Conflict",
+    411: "Length Required",
+    413: "Content Too Large",
+    422: "Unprocessable Content",
+}
+
+
+class UploadServer:
+    # receives photos of drawings over http and scans them in the workers of a ScanPipeline, without writing them
+    # to disk first. POST /upload with the image as body answers with json: {"file": ..., "template_id": ...}
+    # or {"error": ...}. GET / serves a form for phones.
+
+    def __init__(
+        self, pipeline, index, host="0.0.0.0", port=8000, pending=None, max_size=32 * 1024 * 1024, callback=None
+    ) -> None:
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        # limits the uploads scanned at the same time, more wait for a slot
+        self.pending = pending or 2 * pipeline.workers
+        self.slots = None
+        self.max_size = max_size
+        # seconds to wait for the headers and body of a request
+        self.timeout = 60
+        # callback(file) of scanned fishes, run by the main loop of the pipeline
+        self.callback = callback
+
+        # content hashes of imported files from the FishIndex, and of uploads being scanned
+        self.hashes = index.hashes()
+        self.counters = {"uploaded": 0, "scanned": 0, "rejected": 0}
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    async def serve(self, started=None):
+        # started is a Future that gets the port, or the error when the server could not start (e.g. port in use)
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.pending)
+        try:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        except Exception as error:
+            if started is None:
+                raise
+            started.set_exception(error)
+            return
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Uploads on http://{self.host}:{self.port}/")
+        if started:
+            started.set_result(self.port)
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def run(self):
+        # serve in the calling thread until interrupted
+        asyncio.run(self.serve())
+
+    def start(self):
+        # serve in a thread, next to the main loop. raises the error of a server that could not start
+        started = Future()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.serve(started),), daemon=True)
+        self.thread.start()
+        try:
+            started.result()
+        except Exception:
+            self.thread.join()
+            self.thread = None
+            raise
+
+    def stop(self):
+        if self.thread:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join()
+            self.thread = None
+
+    async def handle(self, reader, writer):
+        try:
+            status, body = await asyncio.wait_for(self.read(reader, writer), self.timeout)
+            if status is None:
+                status, body = await self.scan(body)
+        except asyncio.TimeoutError:
+            status, body = 408, {"error": "request timed out"}
+        except (ValueError, asyncio.IncompleteReadError):
+            status, body = 400, {"error": "bad request"}
+        except ConnectionError:
+            writer.close()
+            return
+        if isinstance(body, dict):
+            body, content_type = json.dumps(body).encode(), "application/json"
+        else:
+            content_type = "text/html; charset=utf-8"
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def read(self, reader, writer):
+        # (None, uploaded bytes) of one request per connection, or (status, json dict or html bytes) to answer
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        path = path.split("?")[0]
+        if path == "/":
+            return (200, FORM) if method == "GET" else (405, {"error": "use GET"})
+        if path != "/upload":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        if "content-length" not in headers:
+            return 411, {"error": "content length required"}
+        length = int(headers["content-length"])
+        if length > self.max_size:
+            return 413, {"error": f"larger than {self.max_size} bytes"}
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        data = await reader.readexactly(length)
+        self.counters["uploaded"] += 1
+        return None, data
+
+    async def scan(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.hashes:
+            self.counters["rejected"] += 1
+            return 409, {"error": "imported before"}
+        self.hashes.add(digest)
+        async with self.slots:
+            try:
+                file, result = await asyncio.wrap_future(self.pipeline.submit_upload(data, digest))
+            except Exception as error:
+                print(error)
+                file, result = None, "scan failed"
+        if file is None:
+            # allow the same photo to be uploaded again
+            self.hashes.discard(digest)
+            self.counters["rejected"] += 1
+            return 422, {"error": result}
+        self.counters["scanned"] += 1
+        if self.callback:
+            self.pipeline.post(file, file, lambda file, result: self.callback(file))
+        return 200, {"file": file, "template_id": result}
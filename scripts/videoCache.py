@@ -0,0 +1,88 @@
+import json
+import os
+import cv2
+import numpy as np
+import pygame
+
+from scripts.videoDecoder import VideoDecoder
+
+
+class VideoCache(VideoDecoder):
+    def __init__(self, file, size, cache=os.path.join("data", "cache")) -> None:
+        super().__init__(file, size)
+        # raw BGR frames at display resolution, described by a json file next to it
+        name = os.path.splitext(os.path.basename(file))[0]
+        self.path = os.path.join(cache, f"{name}-{self.size[0]}x{self.size[1]}.raw")
+        self.meta_path = f"{self.path}.json"
+        self.frames = None
+
+    def source(self):
+        # cache key of the source video, the target resolution is part of the cache file name
+        stat = os.stat(self.file)
+        return {"file": os.path.abspath(self.file), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def isValid(self):
+        try:
+            with open(self.meta_path) as file:
+                meta = json.load(file)
+            return meta["source"] == self.source() and os.path.getsize(self.path) == meta["frames"] * self.frame_size()
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def frame_size(self):
+        return self.size[0] * self.size[1] * 3
+
+    def build(self):
+        capture = cv2.VideoCapture(self.file)
+        if not capture.isOpened():
+            return False
+        fps = capture.get(cv2.CAP_PROP_FPS) or self.fps
+        frames = 0
+        temp = f"{self.path}.tmp"
+        try:
+            with open(temp, "wb") as file:
+                while True:
+                    success, frame = capture.read()
+                    if not success:
+                        break
+                    if frame.shape[1::-1] != self.size:
+                        frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                    file.write(np.ascontiguousarray(frame).data)
+                    frames += 1
+        finally:
+            capture.release()
+        if frames == 0:
+            os.remove(temp)
+            return False
+
+        # replace cache atomically, meta data last so a broken build is never considered valid
+        os.replace(temp, self.path)
+        with open(self.meta_path, "w") as file:
+            json.dump({"source": self.source(), "fps": fps, "frames": frames}, file)
+        return True
+
+    def start(self):
+        if not os.path.isfile(self.file) or not (self.isValid() or self.build()):
+            return
+        with open(self.meta_path) as file:
+            meta = json.load(file)
+        self.fps = meta["fps"]
+        self.frames = np.memmap(self.path, np.uint8, "r", shape=(meta["frames"], self.size[1], self.size[0], 3))
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        self.frames = None
+
+    def get_frame(self, now=None, block=False):
+        if self.frames is None:
+            return self.frame
+        due = self.due(now)
+        if due <= self.index:
+            return self.frame
+
+        # frames are served straight from the memory map, skipped ones count as dropped
+        self.dropped += due - self.index - 1
+        self.index = due
+        self.frame = pygame.image.frombuffer(self.frames[due % len(self.frames)], self.size, "BGR")
+        return self.frame
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+import cv2
+import pygame
+
+
+class VideoDecoder:
+    def __init__(self, file, size, buffer=8) -> None:
+        self.file = file
+        self.size = tuple(size)
+        self.buffer = buffer
+        self.fps = 25
+
+        # ring of decoded (index, surface) tuples, filled by the decoder thread
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        # playback
+        self.frame = pygame.Surface(self.size)
+        self.index = -1
+        self.start_ts = None
+
+        # stats
+        self.dropped = 0
+        self.late = 0
+        self.late_index = -1
+
+    def start(self):
+        capture = cv2.VideoCapture(self.file)
+        if not capture.isOpened():
+            return
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or self.fps
+        self.running = True
+        self.thread = threading.Thread(target=self.decode, args=(capture,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def decode(self, capture):
+        index = 0
+        try:
+            while self.running:
+                success, frame = capture.read()
+                if not success:
+                    # rewind at the end of the video, the buffered frames cover the seek
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    success, frame = capture.read()
+                    if not success:
+                        break
+                if frame.shape[1::-1] != self.size:
+                    frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                surface = pygame.image.frombuffer(frame.tobytes(), self.size, "BGR")
+
+                # wait for a free slot in the ring
+                with self.condition:
+                    while self.running and len(self.frames) >= self.buffer:
+                        self.condition.wait()
+                    self.frames.append((index, surface))
+                    self.condition.notify_all()
+                index += 1
+        finally:
+            capture.release()
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def due(self, now=None):
+        # index of the frame due at the video's own frame rate, independent of the render rate.
+        # now is the playback time in seconds when rendering offline, the wall clock otherwise.
+        now = time.perf_counter() if now is None else now
+        if self.start_ts is None:
+            self.start_ts = now
+        # the epsilon keeps offline times like 29 / 25 from rounding down to the previous frame
+        return int((now - self.start_ts) * self.fps + 1e-6)
+
+    def get_frame(self, now=None, block=False):
+        due = self.due(now)
+        if due <= self.index:
+            return self.frame
+
+        with self.condition:
+            popped = 0
+            # when rendering offline, wait for the due frame instead of showing a late one
+            while block and self.running and not (self.frames and self.frames[-1][0] >= due):
+                if len(self.frames) >= self.buffer:
+                    # all buffered frames are past, make room for the decoder
+                    self.index, self.frame = self.frames.popleft()
+                    popped += 1
+                    self.condition.notify_all()
+                self.condition.wait()
+            while self.frames and self.frames[0][0] <= due:
+                self.index, self.frame = self.frames.popleft()
+                popped += 1
+            if popped:
+                # frames we had to skip to catch up
+                self.dropped += popped - 1
+                self.condition.notify()
+            elif self.running and due != self.late_index:
+                # the decoder did not keep up, count each missed frame once
+                self.late += 1
+                self.late_index = due
+        return self.frame
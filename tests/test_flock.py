@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from scripts.flock import Flock  # noqa: E402
+from utils.benchmark import benchmark_allocations, create_flock  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def root(monkeypatch):
+    # assets are loaded relative to the repository
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.mark.parametrize("boids", [25, 300])
+def test_grid_matches_dense(boids):
+    # the grid neighbor search finds the same pairs as comparing all boids, only summed in another order
+    dense, grid = (create_flock(boids, 10, neighbors) for neighbors in ("dense", "grid"))
+    for tick in range(25):
+        for flock in (dense, grid):
+            flock.update(1 / 25, (1, 0))
+    np.testing.assert_allclose(grid.positions, dense.positions, atol=1e-4)
+    np.testing.assert_allclose(grid.velocities, dense.velocities, atol=1e-4)
+
+
+def test_dense_ticks_allocate_the_same_for_any_flock_size():
+    # forces accumulate in preallocated buffers, what is left are numpy's fixed size iterator buffers
+    small = benchmark_allocations(100, 20, 10, "dense")
+    large = benchmark_allocations(800, 20, 10, "dense")
+    assert large <= small * 1.1, f"{large} bytes per tick with 800 boids, {small} with 100"
+
+
+@pytest.mark.parametrize("neighbors", ["dense", "grid"])
+def test_empty_tank(neighbors):
+    flock = Flock(max=25, area=(100, 100, 1180, 620), neighbors=neighbors, headless=True, seed=0)
+    flock.feed()
+    for tick in range(25):
+        flock.update(1 / 25, (1, 0))
+    assert flock.count == 0
+
+
+def test_parked_boids_come_back_as_the_oldest():
+    # boids are ids 0..9 in the order they were added, new boids replace the oldest
+    flock = Flock(max=10, area=(100, 100, 1180, 620), headless=True, seed=0)
+    for id in range(10):
+        flock.add(id)
+    flock.set_limit(6)
+    assert [flock.boids[slot] for slot in flock.order()] == [4, 5, 6, 7, 8, 9]
+    flock.set_limit(8)
+    assert [flock.boids[slot] for slot in flock.order()] == [2, 3, 4, 5, 6, 7, 8, 9]
+    flock.set_limit(10)
+    assert [flock.boids[slot] for slot in flock.order()] == list(range(10))
+    flock.add(10)
+    assert [flock.boids[slot] for slot in flock.order()] == list(range(1, 11))
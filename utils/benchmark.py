@@ -0,0 +1,155 @@
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+import pygame
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.flock import Flock  # noqa: E402
+from scripts.presenter import RendererPresenter, SurfacePresenter  # noqa: E402
+from scripts.scanner import Scanner  # noqa: E402
+
+# scanner settings to compare: (name, detect_width, warp_width, interpolation)
+SCANNERS = [
+    ("fast 300/600", 300, 600, cv2.INTER_LINEAR),
+    ("coarse 300/1200", 300, 1200, cv2.INTER_LINEAR),
+    ("default 600/1200", 600, 1200, cv2.INTER_LINEAR),
+    ("high 600/full", 600, None, cv2.INTER_CUBIC),
+]
+
+
+def create_flock(boids, food, neighbors):
+    # grow the tank with the flock, so that density stays the same as 25 fishes in the 1280x720 display
+    scale = math.sqrt(boids / 25)
+    width, height = int(1280 * scale), int(720 * scale)
+    flock = Flock(max=boids, area=(100, 100, width - 100, height - 100), neighbors=neighbors, headless=True, seed=0)
+    for _ in range(boids):
+        flock.add(None)
+    for _ in range(food):
+        flock.feed()
+    # put the predator into the middle of the flock
+    flock.predator[:] = flock.positions.mean(axis=0)
+    return flock
+
+
+def benchmark(boids, ticks, food, neighbors, timestep=1 / 25):
+    flock = create_flock(boids, food, neighbors)
+    flock.timings = {}
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        # keep food in the tank and the predator moving
+        if len(flock.food) < food:
+            flock.feed()
+        flock.update(timestep, (1 if tick % 50 < 25 else -1, 0))
+    elapsed = time.perf_counter() - start
+
+    return ticks / elapsed, {name: seconds / ticks for name, seconds in flock.timings.items()}
+
+
+def benchmark_allocations(boids, ticks, food, neighbors, timestep=1 / 25):
+    # peak bytes allocated during a tick once the flock is full, which should not grow with the flock
+    flock = create_flock(boids, food, neighbors)
+    for tick in range(3):
+        flock.update(timestep, (1, 0))
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for tick in range(ticks):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            flock.update(timestep, (1 if tick % 50 < 25 else -1, 0))
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark_scanner(scanner, images, references):
+    # scans per second and the mean distance of the warp corners to those detected at full resolution
+    start = time.perf_counter()
+    scanned = sum(scanner.scan_image(image) is not None for image in images)
+    elapsed = time.perf_counter() - start
+
+    errors = []
+    for image, reference in zip(images, references):
+        fine, markers, template_id = scanner.locate(image)
+        if len(markers) < 4 or len(reference) < 4:
+            continue
+        scale = image.shape[1] / fine.shape[1]
+        errors += [np.hypot(*(markers[id][id] * scale - reference[id][id])) for id in range(4)]
+    return len(images) / elapsed, scanned, np.mean(errors) if errors else float("nan")
+
+
+def benchmark_scanners(photos):
+    images = [image for image in (cv2.imread(photo) for photo in photos) if image is not None]
+    with tempfile.TemporaryDirectory() as outbound:
+        # markers detected at full resolution serve as reference
+        references = [Scanner(outbound).detect(image)[0] for image in images]
+        for name, detect_width, warp_width, interpolation in SCANNERS:
+            scanner = Scanner(outbound, detect_width=detect_width, warp_width=warp_width, interpolation=interpolation)
+            scans_per_second, scanned, error = benchmark_scanner(scanner, images, references)
+            print(
+                f"{name:<18}{scans_per_second:8.2f} scans/s {scanned:>5}/{len(images)} scanned "
+                f"{error:8.2f} px corner error"
+            )
+
+
+def benchmark_presenters(size, frames=100):
+    # frames per second of presenting the 1280x720 display on a screen of size
+    pygame.init()
+    display = pygame.Surface((1280, 720))
+    pygame.surfarray.blit_array(display, np.random.randint(0, 255, (1280, 720, 3)))
+    for name, presenter, smooth in [
+        ("surface smooth", SurfacePresenter, True),
+        ("surface fast", SurfacePresenter, False),
+        ("renderer", RendererPresenter, True),
+    ]:
+        presenter = presenter(display.get_size(), size=size, smooth=smooth)
+        start = time.perf_counter()
+        for _ in range(frames):
+            presenter.present(display)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<18}{frames / elapsed:8.1f} frames/s {elapsed / frames * 1000:8.2f} ms")
+    pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the boid simulation without a display")
+    parser.add_argument("--boids", type=int, nargs="+", default=[25, 250, 2500, 25000])
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--food", type=int, default=20)
+    parser.add_argument("--neighbors", choices=["dense", "grid"], default="grid")
+    parser.add_argument("--allocations", action="store_true", help="measure memory allocated per tick instead")
+    parser.add_argument("--photos", nargs="+", help="benchmark the scanner on these photos instead")
+    parser.add_argument("--present", metavar="WIDTHxHEIGHT", help="benchmark presenting on a screen of this size")
+    args = parser.parse_args()
+
+    if args.photos:
+        benchmark_scanners(args.photos)
+        return
+    if args.present:
+        benchmark_presenters(tuple(int(value) for value in args.present.split("x")))
+        return
+
+    for boids in args.boids:
+        # fewer ticks for large flocks, but at least a few
+        ticks = max(5, min(args.ticks, args.ticks * 250 // boids))
+        if args.allocations:
+            peak = benchmark_allocations(boids, ticks, args.food, args.neighbors)
+            print(f"{boids:>6} boids: {peak / 1024:10.1f} KiB allocated per tick at most ({ticks} ticks)")
+            continue
+        ticks_per_second, timings = benchmark(boids, ticks, args.food, args.neighbors)
+        print(f"{boids:>6} boids: {ticks_per_second:10.1f} ticks/s ({ticks} ticks)")
+        for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+            print(f"{'':>14}{name:<20}{seconds * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
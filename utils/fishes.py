@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.fishIndex import FishIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the index of imported fishes")
+    parser.add_argument("--index", default=os.path.join("data", "cache", "fishes.db"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("import", help="add fishes in outbound that are missing in the index")
+    add.add_argument("--outbound", default=os.path.join("data", "outbound"))
+    add.add_argument("--scanned", default=os.path.join("data", "cache", "scanned.txt"), help="hashes of scanned files")
+    archive = commands.add_parser("archive", help="move all but the newest fishes out of outbound")
+    archive.add_argument("--keep", type=int, default=1000)
+    archive.add_argument("--to", default=os.path.join("data", "archive"))
+    archive.add_argument("--compact", action="store_true", help="compact the index afterwards")
+    commands.add_parser("compact", help="give space of archived thumbnails back to the file system")
+    commands.add_parser("stats", help="count indexed fishes")
+    args = parser.parse_args()
+
+    index = FishIndex(args.index)
+    if args.command == "import":
+        print(f"Found {index.import_files(args.outbound, args.scanned)} fishes in {args.outbound}")
+    elif args.command == "archive":
+        print(f"Archived {index.archive(args.keep, args.to)} fishes to {args.to}")
+        if args.compact:
+            index.compact()
+    elif args.command == "compact":
+        index.compact()
+    print(f"{index.count()} fishes, {index.count(archived=True)} archived, {os.path.getsize(args.index)} bytes")
+
+
+if __name__ == "__main__":
+    main()
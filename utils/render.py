@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import aquarium  # noqa: E402
+
+
+def load_script(file):
+    # lines of "<frame> <action> [<action> ...]", see Aquarium.render_offline
+    script = {}
+    with open(file) as lines:
+        for line in lines:
+            line = line.split("#")[0].split()
+            if line:
+                script.setdefault(int(line[0]), []).extend(line[1:])
+    return script
+
+
+def default_script(frames):
+    # feed every 2 seconds and let the submarine patrol left and right
+    script = {}
+    for frame in range(0, frames, 50):
+        script.setdefault(frame, []).append("feed")
+    for frame in range(0, frames, 200):
+        script.setdefault(frame, []).append("right")
+        script.setdefault(frame + 100, []).append("left")
+    return script
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the fish tank into a video or image sequence without a window"
+    )
+    parser.add_argument("output", help="video file piped through ffmpeg, or an image pattern like frames/%%05d.png")
+    parser.add_argument("--frames", type=int, default=250)
+    parser.add_argument("--size", metavar="WIDTHxHEIGHT", help="output resolution (default 1280x720)")
+    parser.add_argument("--script", help="file of scripted input (default: feed and patrol)")
+    parser.add_argument("--seed", type=int, help="seed of the simulation's random numbers")
+    args = parser.parse_args()
+
+    aquarium.SEED = args.seed
+    size = tuple(int(value) for value in args.size.split("x")) if args.size else None
+    script = load_script(args.script) if args.script else default_script(args.frames)
+
+    frames_per_second = aquarium.Aquarium(offline=True).render_offline(args.output, args.frames, size, script)
+    print(f"Rendered {args.frames} frames: {frames_per_second:.1f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
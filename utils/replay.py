@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.recorder import Replay  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session headless as fast as possible")
+    parser.add_argument("log", help="file written with RECORD in scripts/aquarium.py")
+    parser.add_argument("--neighbors", choices=["dense", "grid"], help="override the recorded neighbor search")
+    parser.add_argument("--every", type=int, default=25, help="keep the positions of every nth tick")
+    parser.add_argument("--save", metavar="FILE", help="save the trajectory to this .npy file")
+    parser.add_argument("--compare", metavar="FILE", help="compare the trajectory with one saved before")
+    args = parser.parse_args()
+
+    replay = Replay(args.log)
+    flock = replay.flock(args.neighbors)
+    print(f"{replay.ticks} ticks, seed {replay.seed}, {replay.max_boids} boids max, {flock.neighbor_search} neighbors")
+
+    flock.timings = {}
+    start = time.perf_counter()
+    trajectory = replay.run(flock, args.every)
+    elapsed = time.perf_counter() - start
+    print(f"{replay.ticks / elapsed:10.1f} ticks/s ({elapsed:.2f} s)")
+    for name, seconds in sorted(flock.timings.items(), key=lambda item: -item[1]):
+        print(f"{'':>4}{name:<20}{seconds / max(replay.ticks, 1) * 1000:10.3f} ms")
+
+    if args.save:
+        np.save(args.save, trajectory)
+    if args.compare:
+        reference = np.load(args.compare)
+        if reference.shape != trajectory.shape:
+            print(f"Trajectories differ in shape: {reference.shape} != {trajectory.shape}")
+            return
+        deviation = np.abs(np.nan_to_num(reference - trajectory))
+        diverged = np.isnan(reference) != np.isnan(trajectory)
+        print(
+            f"Max deviation {deviation.max(initial=0):.3g} px, mean {deviation.mean() if deviation.size else 0:.3g} px"
+        )
+        if diverged.any():
+            print("Trajectories differ in live boids")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.fishIndex import FishIndex  # noqa: E402
+from scripts.scanPipeline import EXTENSIONS, file_hash, init_worker, scan  # noqa: E402
+
+
+def find_files(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files += [os.path.join(pattern, file) for file in sorted(os.listdir(pattern))]
+        else:
+            files += sorted(glob.glob(pattern))
+    return [file for file in files if os.path.isfile(file) and file.lower().endswith(EXTENSIONS)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a directory or glob of drawings into data/outbound")
+    parser.add_argument("files", nargs="+", help="directories, files or glob patterns")
+    parser.add_argument("--outbound", default=os.path.join("data", "outbound"))
+    parser.add_argument("--index", default=os.path.join("data", "cache", "fishes.db"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--rescan", action="store_true", help="scan files even if they have been scanned before")
+    args = parser.parse_args()
+
+    scanned = set() if args.rescan else FishIndex(args.index).hashes()
+    jobs = {}
+    skipped = 0
+    for file in find_files(args.files):
+        digest = file_hash(file)
+        if digest in scanned or digest in jobs.values():
+            print(f"skipped  {file}")
+            skipped += 1
+        else:
+            jobs[file] = digest
+
+    succeeded = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(args.outbound, args.index),
+    ) as executor:
+        futures = {executor.submit(scan, file, digest): file for file, digest in jobs.items()}
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                result = None
+                print(error)
+            if result is None:
+                print(f"failed   {file}")
+            else:
+                print(f"ok       {file} -> {result}")
+                succeeded += 1
+    elapsed = time.perf_counter() - start
+
+    failed = len(jobs) - succeeded
+    print(f"{succeeded} scanned, {failed} failed, {skipped} skipped")
+    if jobs:
+        print(f"{len(jobs)} files in {elapsed:.1f}s ({len(jobs) / elapsed:.1f} files/s, {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import aquarium  # noqa: E402
+from scripts.sharedFlock import SharedFlock  # noqa: E402
+from scripts.snapshotTransport import SnapshotSubscriber  # noqa: E402
+from scripts.tankScreen import TankScreen  # noqa: E402
+from scripts.tankSimulation import TankSimulation  # noqa: E402
+
+
+def run_shared_screen(name, screen, inputs, display):
+    # renderer process of a screen on the machine of the simulation
+    TankScreen(SharedFlock(name), screen, inputs.put, display).run()
+
+
+def run_remote_screen(address, authkey, screen, display):
+    subscriber = SnapshotSubscriber(address, authkey)
+    TankScreen(subscriber, screen, subscriber.send, display).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run one tank across several screens, with one simulation process and one renderer per screen"
+    )
+    parser.add_argument("--screens", type=int, default=2, help="screens of the tank, side by side")
+    parser.add_argument(
+        "--local", type=int, nargs="*", help="screens rendered on this machine, on its displays in order (default all)"
+    )
+    parser.add_argument("--boids", type=int, default=25, help="fishes per screen")
+    parser.add_argument("--publish", metavar="HOST:PORT", help="serve the tank to screens on other machines")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="render screens of a tank served by another machine")
+    parser.add_argument("--authkey", help="shared secret of the machines, required with --publish and --connect")
+    args = parser.parse_args()
+    if (args.publish or args.connect) and not args.authkey:
+        parser.error("--authkey is required with --publish and --connect")
+
+    authkey = args.authkey.encode() if args.authkey else None
+    local = list(range(args.screens)) if args.local is None else args.local
+    # each renderer initializes its own display
+    context = multiprocessing.get_context("spawn")
+
+    if args.connect:
+        processes = [
+            context.Process(target=run_remote_screen, args=(args.connect, authkey, screen, display))
+            for display, screen in enumerate(local)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return
+
+    inputs = context.Queue()
+    simulation = TankSimulation(
+        args.screens,
+        boids_per_screen=args.boids,
+        index=aquarium.FISH_INDEX,
+        inputs=inputs,
+        publish=args.publish,
+        authkey=authkey,
+        rate=aquarium.SIMULATION_RATE,
+        neighbors=aquarium.NEIGHBORS,
+        seed=aquarium.SEED,
+    )
+    processes = [
+        context.Process(target=run_shared_screen, args=(simulation.shared.name, screen, inputs, display))
+        for display, screen in enumerate(local)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Simulating {simulation.flock.count} fishes in a world of {simulation.shared.world}")
+    try:
+        # without local screens, serve until interrupted
+        simulation.run(alive=(lambda: any(process.is_alive() for process in processes)) if processes else None)
+    except KeyboardInterrupt:
+        pass
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
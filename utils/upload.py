@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.fishIndex import FishIndex  # noqa: E402
+from scripts.scanPipeline import ScanPipeline  # noqa: E402
+from scripts.uploadServer import UploadServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a page to upload photos of drawings, which are scanned into data/outbound"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--outbound", default=os.path.join("data", "outbound"))
+    parser.add_argument("--index", default=os.path.join("data", "cache", "fishes.db"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--pending", type=int, help="uploads scanned at the same time (default 2 per worker)")
+    parser.add_argument("--max-size", type=int, default=32, help="largest upload in MB")
+    args = parser.parse_args()
+
+    index = FishIndex(args.index)
+    pipeline = ScanPipeline(args.outbound, workers=args.workers, index=args.index)
+    server = UploadServer(
+        pipeline, index, args.host, args.port, pending=args.pending, max_size=args.max_size * 1024 * 1024
+    )
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.close()
+        index.close()
+        print(f"Uploads: {server.counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.videoCache import VideoCache  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-decode the background video into data/cache")
+    parser.add_argument("file", nargs="?", default=os.path.join("data/video/underwater.mp4"))
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is up to date")
+    args = parser.parse_args()
+
+    cache = VideoCache(args.file, (args.width, args.height))
+    if cache.isValid() and not args.force:
+        print(f"{cache.path} is up to date")
+    elif cache.build():
+        print(f"Wrote {cache.path}")
+    else:
+        print(f"Failed to decode {args.file}")
+
+
+if __name__ == "__main__":
+    main()